@@ -0,0 +1,151 @@
+"""
+Runs one plugin invocation the way Kodi does (fresh interpreter, addon.py as
+__main__ with the plugin URL, handle and query in sys.argv) and prints its
+measurements as one JSON line. Started by run.py, configured through:
+
+  CBTV_BENCH_PROFILE  addon profile directory (the on-disk caches)
+  CBTV_BENCH_REPLAY   base URL of the replay server every request is sent to
+  CBTV_BENCH_TRACE    "1" to trace allocations with tracemalloc (slower)
+  CBTV_BENCH_LOG      optional file receiving the addon log
+
+usage: child.py "?action=..."   |   child.py --routes
+"""
+import time
+_T0 = time.perf_counter()
+
+import importlib.abc
+import importlib.machinery
+import json
+import os
+import runpy
+import sys
+import threading
+import tracemalloc
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.normpath(os.path.join(HERE, "..", "plugin.video.cbtv"))
+PLUGIN_URL = "plugin://plugin.video.cbtv/"
+
+
+def _install_replay(httpclient, base_url):
+    """Send every request of the shared session to the replay server (keeps pooling and retries)"""
+    from requests.adapters import HTTPAdapter
+
+    class ReplayAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = f"{base_url}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+            return super().send(request, **kwargs)
+
+    get_session = httpclient.get_session
+
+    def replay_session():
+        session = get_session()
+        if not getattr(session, "_bench_replay", False):
+            current = session.get_adapter("https://")
+            adapter = ReplayAdapter(pool_connections=httpclient.POOL_HOSTS, pool_maxsize=httpclient.POOL_PER_HOST,
+                                    max_retries=current.max_retries, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session._bench_replay = True
+        return session
+
+    httpclient.get_session = replay_session
+
+
+class ReplayHook(importlib.abc.MetaPathFinder):
+    """
+    Patches resources.lib.httpclient right after the addon imports it, so the
+    actions that never touch the network still skip importing requests.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def find_spec(self, name, path, target=None):
+        if name != "resources.lib.httpclient":
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(name, path)
+        exec_module = spec.loader.exec_module
+
+        def exec_and_patch(module):
+            exec_module(module)
+            _install_replay(module, self.base_url)
+
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+
+def _last_action_record(profile):
+    """The router's own record of the invocation (first item time, items, requests)"""
+    try:
+        with open(os.path.join(profile, "stats", "actions.jsonl"), "r", encoding="utf-8") as f:
+            return json.loads(f.readlines()[-1])
+    except (OSError, ValueError, IndexError):
+        return {}
+
+
+def main():
+    sys.path[:0] = [os.path.join(HERE, "stubs"), ADDON_DIR]
+    os.chdir(ADDON_DIR)
+    routes_only = sys.argv[1:] == ["--routes"]
+    query = "" if routes_only else (sys.argv[1] if len(sys.argv) > 1 else "")
+    sys.argv = [PLUGIN_URL, "1", query]
+
+    replay = os.environ.get("CBTV_BENCH_REPLAY")
+    if replay:
+        sys.meta_path.insert(0, ReplayHook(replay))
+
+    if routes_only:
+        g = runpy.run_path(os.path.join(ADDON_DIR, "addon.py"), run_name="bench_routes")
+        print(json.dumps(sorted(g["router"].routes)))
+        return
+
+    trace = os.environ.get("CBTV_BENCH_TRACE") == "1"
+    blocks = sys.getallocatedblocks()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        runpy.run_path(os.path.join(ADDON_DIR, "addon.py"), run_name="__main__")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    done = time.perf_counter()
+    # Background work (stale refreshes, precomputation) the interpreter waits for
+    for t in threading.enumerate():
+        if t is not threading.main_thread() and not t.daemon:
+            t.join()
+    exited = time.perf_counter()
+
+    result = {
+        "wall_ms": round((done - start) * 1000, 2),
+        "exit_ms": round((exited - start) * 1000, 2),
+        "startup_ms": round((start - _T0) * 1000, 2),
+        "error": error,
+    }
+    if trace:
+        result["alloc_peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    else:
+        result["alloc_blocks"] = sys.getallocatedblocks() - blocks
+
+    import xbmc
+    import xbmcgui
+    import xbmcplugin
+    record = _last_action_record(os.environ.get("CBTV_BENCH_PROFILE", ""))
+    result.update({
+        "action": record.get("action"),
+        "first_item_ms": record.get("first_item_ms"),
+        "requests": record.get("requests"),
+        "items": len(xbmcplugin.ITEMS),
+        "resolved": len(xbmcplugin.RESOLVED),
+        "dialogs": [d[0] for d in xbmcgui.DIALOGS],
+        "log_errors": xbmc.LOG_COUNTS.get(xbmc.LOGERROR, 0),
+    })
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
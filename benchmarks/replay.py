@@ -0,0 +1,97 @@
+"""
+Local stand-in for the upstreams: serves the recorded responses in fixtures/
+over plain HTTP on 127.0.0.1. Requests arrive as /<host><path> (the benchmark
+child rewrites every outbound URL that way) and are looked up in
+fixtures/manifest.json. Responses carry an ETag, so conditional GETs get 304s
+like they would from the real servers.
+
+Fixtures flagged "template" may contain {{date:<days>:<fmt>}} placeholders,
+rendered relative to today ("rfc822" or "it", e.g. "18 ottobre"), so a feed
+recorded once keeps looking like today's feed.
+"""
+import datetime
+import email.utils
+import hashlib
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MONTHS_IT = ["gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio",
+             "agosto", "settembre", "ottobre", "novembre", "dicembre"]
+DATE_RE = re.compile(r'\{\{date:(-?\d+):(rfc822|it)\}\}')
+
+
+def _render_date(m):
+    day = datetime.datetime.now(datetime.timezone.utc).replace(hour=6, minute=0, second=0, microsecond=0)
+    day += datetime.timedelta(days=int(m.group(1)))
+    if m.group(2) == "rfc822":
+        return email.utils.format_datetime(day)
+    return f"{day.day} {MONTHS_IT[day.month - 1]}"
+
+
+def load_fixtures(directory=FIXTURES):
+    """{"host/path": (content_type, body bytes, etag)}"""
+    with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    routes = {}
+    for route, spec in manifest.items():
+        with open(os.path.join(directory, spec["file"]), "r", encoding="utf-8") as f:
+            body = f.read()
+        if spec.get("template"):
+            body = DATE_RE.sub(_render_date, body)
+        body = body.encode("utf-8")
+        routes[route] = (spec["type"], body, '"' + hashlib.sha1(body).hexdigest()[:16] + '"')
+    return routes
+
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, routes, latency=0.0):
+        super().__init__(("127.0.0.1", 0), ReplayHandler)
+        self.routes = routes
+        self.latency = latency
+        self.hits = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        route = self.path.lstrip("/").split("?", 1)[0]
+        self.server.hits[route] = self.server.hits.get(route, 0) + 1
+        if self.server.latency:
+            threading.Event().wait(self.server.latency)
+        found = self.server.routes.get(route)
+        if found is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content_type, body, etag = found
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
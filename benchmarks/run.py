@@ -0,0 +1,193 @@
+"""
+Offline benchmark of every addon action, no Kodi needed.
+
+Each scenario of scenarios.json is run in a fresh interpreter (child.py),
+as Kodi does for every folder, against stand-in xbmc modules (stubs/) and a
+local server replaying the recorded upstream responses (fixtures/):
+
+  cold  empty addon profile: every cache is filled from the replay server
+  warm  profile primed by one unmeasured run: what a user sees on a revisit
+
+A scenario may name "prime" actions (one object or a list) run unmeasured on
+every profile first: the widgets only read what other actions or the service
+cached, so without it both modes would measure their empty path.
+
+Reported per action and mode: median and worst wall time (interpreter ready
+-> addon.py returns), median time to the first list item (the router's own
+measure), items listed, HTTP requests, retained allocation blocks and the
+tracemalloc allocation peak of one extra traced run.
+
+usage: python benchmarks/run.py [--repeat N] [--mode cold|warm] [--only ACTION ...]
+                                [--latency SECONDS] [--json FILE] [--log DIR]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from urllib.parse import urlencode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from replay import ReplayServer, load_fixtures  # noqa: E402
+
+CHILD = os.path.join(HERE, "child.py")
+SCENARIOS = os.path.join(HERE, "scenarios.json")
+MODES = ("cold", "warm")
+
+
+def _query(params):
+    # Object parameters are passed as JSON, like legacy listing URLs
+    return "?" + urlencode({k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in params.items()})
+
+
+def load_scenarios(path=SCENARIOS):
+    """[(name, query string, [prime query strings])]"""
+    with open(path, "r", encoding="utf-8") as f:
+        scenarios = json.load(f)
+    result = []
+    for sc in scenarios:
+        sc = dict(sc)
+        name = sc.pop("name", sc["action"])
+        prime = sc.pop("prime", [])
+        prime = [prime] if isinstance(prime, dict) else prime
+        result.append((name, _query(sc), [_query(p) for p in prime]))
+    return result
+
+
+def run_child(query, profile, replay_url, trace=False, log_dir=None, extra_env=None):
+    env = dict(os.environ, CBTV_BENCH_PROFILE=profile, CBTV_BENCH_REPLAY=replay_url,
+               CBTV_BENCH_TRACE="1" if trace else "0", **(extra_env or {}))
+    if log_dir:
+        env["CBTV_BENCH_LOG"] = os.path.join(log_dir, "addon.log")
+    proc = subprocess.run([sys.executable, CHILD, query], env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or ["child failed"])[-1]}
+    return json.loads(lines[-1])
+
+
+def list_routes(replay_url):
+    with tempfile.TemporaryDirectory() as profile:
+        env = dict(os.environ, CBTV_BENCH_PROFILE=profile, CBTV_BENCH_REPLAY=replay_url)
+        proc = subprocess.run([sys.executable, CHILD, "--routes"], env=env, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return []
+
+
+def bench(query, mode, repeat, replay_url, log_dir=None, extra_env=None, prime=()):
+    """Measured runs of one scenario in one mode, summarized"""
+    runs = []
+    work = tempfile.mkdtemp(prefix="cbtv-bench-")
+    try:
+        def fresh_profile(n):
+            path = os.path.join(work, f"profile{n}")
+            os.makedirs(path)
+            for q in prime:
+                run_child(q, path, replay_url, log_dir=log_dir, extra_env=extra_env)
+            return path
+
+        if mode == "warm":
+            profile = fresh_profile(0)
+            run_child(query, profile, replay_url, log_dir=log_dir, extra_env=extra_env)
+            profiles = [profile] * (repeat + 1)
+        else:
+            profiles = [fresh_profile(n) for n in range(repeat + 1)]
+
+        for n in range(repeat):
+            runs.append(run_child(query, profiles[n], replay_url, log_dir=log_dir, extra_env=extra_env))
+        traced = run_child(query, profiles[repeat], replay_url, trace=True, log_dir=log_dir, extra_env=extra_env)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return summarize(runs, traced)
+
+
+def summarize(runs, traced):
+    ok = [r for r in runs if not r.get("error")]
+    errors = sorted({r["error"] for r in runs + [traced] if r.get("error")})
+    if not ok:
+        return {"error": errors[0] if errors else "no runs"}
+    walls = [r["wall_ms"] for r in ok]
+    firsts = [r["first_item_ms"] for r in ok if r.get("first_item_ms") is not None]
+    last = ok[-1]
+    return {
+        "wall_ms": round(statistics.median(walls), 1),
+        "wall_max_ms": round(max(walls), 1),
+        "exit_ms": round(statistics.median(r["exit_ms"] for r in ok), 1),
+        "first_item_ms": statistics.median(firsts) if firsts else None,
+        "items": last.get("items"),
+        "resolved": last.get("resolved"),
+        "requests": last.get("requests"),
+        "alloc_blocks": int(statistics.median(r.get("alloc_blocks", 0) for r in ok)),
+        "alloc_peak_kb": traced.get("alloc_peak_kb"),
+        "log_errors": last.get("log_errors"),
+        "error": errors[0] if errors else None,
+    }
+
+
+def print_report(results, modes):
+    header = f"{'action':<34} {'mode':<5} {'wall ms':>8} {'max':>8} {'1st item':>8} {'items':>5} {'req':>4} {'blocks':>7} {'peak KB':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, by_mode in results.items():
+        for mode in modes:
+            r = by_mode.get(mode)
+            if r is None:
+                continue
+            if r.get("error") and "wall_ms" not in r:
+                print(f"{name:<34} {mode:<5} ERROR {r['error']}")
+                continue
+            first = "-" if r["first_item_ms"] is None else r["first_item_ms"]
+            items = r["items"] if not r["resolved"] else f"{r['resolved']}R"
+            print(f"{name:<34} {mode:<5} {r['wall_ms']:>8} {r['wall_max_ms']:>8} {first:>8} {items:>5} "
+                  f"{r['requests'] if r['requests'] is not None else '-':>4} {r['alloc_blocks']:>7} "
+                  f"{r['alloc_peak_kb'] if r['alloc_peak_kb'] is not None else '-':>8}"
+                  + (f"  ! {r['error']}" if r.get("error") else "")
+                  + (f"  ({r['log_errors']} log errors)" if r.get("log_errors") else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline per-action benchmark of plugin.video.cbtv")
+    parser.add_argument("--repeat", type=int, default=3, help="measured runs per action and mode")
+    parser.add_argument("--mode", choices=MODES, action="append", help="default: both")
+    parser.add_argument("--only", nargs="+", metavar="ACTION", help="scenario names to run")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay added to every replayed response (s)")
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--log", metavar="DIR", help="keep the addon log in DIR/addon.log")
+    args = parser.parse_args(argv)
+    modes = args.mode or list(MODES)
+    if args.log:
+        os.makedirs(args.log, exist_ok=True)
+
+    server = ReplayServer(load_fixtures(), latency=args.latency).start()
+    try:
+        scenarios = load_scenarios()
+        covered = {q.split("action=", 1)[1].split("&", 1)[0] for _, q, _ in scenarios}
+        missing = sorted(set(list_routes(server.url)) - covered)
+        if missing:
+            print(f"warning: no scenario for {', '.join(missing)}", file=sys.stderr)
+
+        results = {}
+        for name, query, prime in scenarios:
+            if args.only and name not in args.only:
+                continue
+            results[name] = {mode: bench(query, mode, args.repeat, server.url, args.log, prime=prime) for mode in modes}
+            print(f"  {name} done", file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    print_report(results, modes)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "latency": args.latency, "results": results}, f, indent=1)
+    return 1 if any(r.get("error") for by_mode in results.values() for r in by_mode.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Scalability benchmark of the channel/event matching code on synthetic
+catalogs (synthetic.py): how time and memory grow with the catalog size.
+
+Stages, timed in process (median of --repeat) and traced once for memory:
+
+  catalog         normalize + online filter + CatalogSnapshot (name index,
+                  by-country and by-sport groups: what list_sport_channels reads)
+  sport_channels  the per-sport keyword lookups of list_sport_channels, cold memo
+  map_channels    scraper.map_channels for every agenda event
+  match_events    matching.match_event_channels for every agenda event (the
+                  channel half of resolve_agenda_event and of the agenda precompute)
+
+The results can be stored as a baseline (baseline_scale.json) that later
+changes to the matching code are checked against. Times are compared after
+scaling by a fixed pure-Python calibration workload, so a baseline recorded on
+another machine stays usable. The workload is timed again before every
+catalog size and the median of those samples is used, since the machine speed
+drifts during a run. As in timeit, the garbage collector is off while timing,
+and --update-baseline keeps the median of three full runs of each stage.
+
+usage: python benchmarks/scale.py [--channels 1000 10000 50000] [--events 100 1000]
+                                  [--repeat N] [--runs N] [--json FILE] [--plot FILE.png]
+                                  [--check | --update-baseline] [--tolerance 0.25]
+"""
+import argparse
+import copy
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.normpath(os.path.join(HERE, "..", "plugin.video.cbtv"))
+BASELINE = os.path.join(HERE, "baseline_scale.json")
+sys.path[:0] = [HERE, os.path.join(HERE, "stubs"), ADDON_DIR]
+os.environ.setdefault("CBTV_BENCH_PROFILE", tempfile.mkdtemp(prefix="cbtv-scale-"))
+
+from synthetic import make_channels, make_events  # noqa: E402
+
+STAGES = ("catalog", "sport_channels", "map_channels", "match_events")
+CHANNEL_SIZES = (1000, 10000, 50000)
+EVENT_SIZES = (100, 1000)
+# Absolute slack on top of the tolerance: timer noise dominates the small stages
+SLACK_MS = 5.0
+
+
+def _timed(fn, *args):
+    """ms of one fn(*args) call with the garbage collector off"""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        fn(*args)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        gc.enable()
+
+
+def _workload():
+    d = {f"channel {i} hd": i for i in range(400000)}
+    sorted(k for k in d if "1" in k)
+
+
+def calibrate(rounds=7):
+    """Median ms of a fixed dict/str/sort workload: the machine speed unit of the baseline"""
+    return statistics.median(_timed(_workload) for _ in range(rounds))
+
+
+def measure(fn, repeat):
+    """(median ms, peak KB) of fn(); fn builds its own inputs so every call starts cold"""
+    times = []
+    for _ in range(repeat):
+        times.append(_timed(fn, *fn.prepare()))
+    args = fn.prepare()
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(statistics.median(times), 2), round(peak / 1024, 1)
+
+
+def stages(payload, events):
+    """{stage: callable with a .prepare() giving its (cold) arguments}"""
+    from resources.lib.catalog import CatalogSnapshot, normalize_catalog
+    from resources.lib.cdnlive import CDNLiveResolver
+    from resources.lib.channel_index import ChannelIndex
+    from resources.lib.matching import match_event_channels
+    from resources.lib.rules import get_rules
+    from resources.lib.scraper import map_channels
+    rules = get_rules()
+    channels = CDNLiveResolver._filter_online(normalize_catalog(copy.deepcopy(payload))["channels"], quiet=True)
+
+    def catalog(data):
+        data = normalize_catalog(data)
+        CatalogSnapshot(CDNLiveResolver._filter_online(data["channels"], quiet=True), "bench", None)
+    catalog.prepare = lambda: (copy.deepcopy(payload),)
+
+    def sport_channels(index):
+        for sport in rules.table.get("sport_channels", {}):
+            found, seen = [], set()
+            for ch in index.match_any(rules.keywords(f"sport_channels.{sport}")):
+                if ch["key"] not in seen:
+                    found.append(ch)
+                    seen.add(ch["key"])
+            sorted(found, key=lambda x: x.get("name"))
+    sport_channels.prepare = lambda: (ChannelIndex(channels),)
+
+    def map_all(index):
+        for ev in events:
+            map_channels(ev["channels_raw"], index.channels, index)
+    map_all.prepare = lambda: (ChannelIndex(channels),)
+
+    def match_all(index):
+        for ev in events:
+            match_event_channels(ev, index, rules)
+    match_all.prepare = lambda: (ChannelIndex(channels),)
+
+    return {"catalog": catalog, "sport_channels": sport_channels,
+            "map_channels": map_all, "match_events": match_all}
+
+
+def run(channel_sizes, event_sizes, repeat, calib_samples):
+    results = []
+    for n in channel_sizes:
+        calib_samples.append(calibrate())
+        payload = make_channels(n)
+        for m in event_sizes:
+            fns = stages(payload, make_events(m))
+            for stage in STAGES:
+                # The catalog stages do not depend on the number of events
+                if stage in ("catalog", "sport_channels") and m != event_sizes[0]:
+                    continue
+                ms, kb = measure(fns[stage], repeat)
+                results.append({"stage": stage, "channels": n, "events": m if stage not in ("catalog", "sport_channels") else None,
+                                "ms": ms, "peak_kb": kb})
+                print(f"  {stage:<15} channels={n:<6} events={m if results[-1]['events'] else '-':<5} {ms:>10} ms {kb:>10} KB",
+                      file=sys.stderr)
+    return results
+
+
+def _key(r):
+    return (r["stage"], r["channels"], r["events"])
+
+
+def combine(passes):
+    """One result list from several full runs: the median time and largest peak of each stage"""
+    results = []
+    for group in zip(*passes):
+        ms = round(statistics.median(r["ms"] for r in group), 2)
+        results.append(dict(group[0], ms=ms, peak_kb=max(r["peak_kb"] for r in group)))
+    return results
+
+
+def ascii_plot(results, width=46):
+    """Time against catalog size per stage, log scaled bars"""
+    top = max(r["ms"] for r in results) or 1
+    lines = []
+    for stage in STAGES:
+        rows = [r for r in results if r["stage"] == stage]
+        if not rows:
+            continue
+        lines.append(stage)
+        for r in sorted(rows, key=lambda r: (r["events"] or 0, r["channels"])):
+            bar = max(1, int(width * math.log10(1 + r["ms"]) / math.log10(1 + top)))
+            label = f"{r['channels']:>6} ch" + (f" x {r['events']:>4} ev" if r["events"] else "          ")
+            lines.append(f"  {label} |{'#' * bar:<{width}}| {r['ms']:>9.1f} ms {r['peak_kb']:>9.1f} KB")
+    return "\n".join(lines)
+
+
+def save_plot(results, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed: skipping --plot (the text plot above has the same data)", file=sys.stderr)
+        return
+    fig, (ax_t, ax_m) = plt.subplots(1, 2, figsize=(12, 5))
+    for stage in STAGES:
+        for m in sorted({r["events"] for r in results if r["stage"] == stage}, key=lambda x: x or 0):
+            rows = sorted((r for r in results if r["stage"] == stage and r["events"] == m), key=lambda r: r["channels"])
+            label = stage + (f" ({m} events)" if m else "")
+            ax_t.plot([r["channels"] for r in rows], [r["ms"] for r in rows], marker="o", label=label)
+            ax_m.plot([r["channels"] for r in rows], [r["peak_kb"] / 1024 for r in rows], marker="o", label=label)
+    for ax, ylabel in ((ax_t, "time (ms)"), (ax_m, "peak memory (MB)")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("channels")
+        ax.set_ylabel(ylabel)
+        ax.grid(True, which="both", alpha=0.3)
+    ax_t.legend(fontsize=7)
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"plot written to {path}", file=sys.stderr)
+
+
+def check(results, calib, baseline, tolerance):
+    """Regressions against the baseline: time (calibration scaled) or memory above tolerance"""
+    scale = calib / baseline["calibration_ms"]
+    base = {_key(r): r for r in baseline["results"]}
+    failures = []
+    for r in results:
+        b = base.get(_key(r))
+        if b is None:
+            continue
+        limit_ms = b["ms"] * scale * (1 + tolerance) + SLACK_MS
+        limit_kb = b["peak_kb"] * (1 + tolerance)
+        where = f"{r['stage']} channels={r['channels']} events={r['events'] or '-'}"
+        if r["ms"] > limit_ms:
+            failures.append(f"{where}: {r['ms']} ms > {limit_ms:.1f} ms (baseline {b['ms']} ms x {scale:.2f})")
+        if r["peak_kb"] > limit_kb:
+            failures.append(f"{where}: {r['peak_kb']} KB > {limit_kb:.1f} KB (baseline {b['peak_kb']} KB)")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Channel/event matching scalability benchmark")
+    parser.add_argument("--channels", type=int, nargs="+", default=list(CHANNEL_SIZES))
+    parser.add_argument("--events", type=int, nargs="+", default=list(EVENT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--runs", type=int, help="full runs, median per stage (default 3 with --update-baseline, else 1)")
+    parser.add_argument("--json", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--plot", metavar="FILE", help="also save a PNG plot (needs matplotlib)")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help=f"store the results in {os.path.basename(BASELINE)}")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth over the baseline")
+    args = parser.parse_args(argv)
+
+    # One run can land on a slow or fast patch of the machine as a whole: the
+    # baseline every later check is held to is the median of several
+    runs = args.runs or (3 if args.update_baseline else 1)
+    calib_samples = [calibrate()]
+    results = combine([run(sorted(args.channels), sorted(args.events), args.repeat, calib_samples)
+                       for _ in range(runs)])
+    calib = round(statistics.median(calib_samples), 2)
+    print(f"calibration: {calib} ms (samples {', '.join(f'{c:.1f}' for c in calib_samples)})", file=sys.stderr)
+    print(ascii_plot(results))
+
+    report = {"python": sys.version.split()[0], "calibration_ms": calib, "repeat": args.repeat, "runs": runs,
+              "results": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    if args.plot:
+        save_plot(results, args.plot)
+    if args.update_baseline:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"baseline stored in {BASELINE}", file=sys.stderr)
+    if args.check:
+        with open(BASELINE, "r", encoding="utf-8") as f:
+            failures = check(results, calib, json.load(f), args.tolerance)
+        for line in failures:
+            print(f"REGRESSION {line}")
+        if failures:
+            return 1
+        print(f"no regression over the baseline (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
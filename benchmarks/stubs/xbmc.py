@@ -0,0 +1,35 @@
+"""Stand-in for Kodi's xbmc module: log lines go to CBTV_BENCH_LOG (if set) and are counted."""
+import os
+
+LOGDEBUG, LOGINFO, LOGWARNING, LOGERROR, LOGFATAL = 0, 1, 2, 3, 4
+
+LOG_COUNTS = {}
+_log_path = os.environ.get("CBTV_BENCH_LOG")
+
+
+def log(msg, level=LOGDEBUG):
+    LOG_COUNTS[level] = LOG_COUNTS.get(level, 0) + 1
+    if _log_path:
+        with open(_log_path, "a", encoding="utf-8") as f:
+            f.write(f"{level} {msg}\n")
+
+
+def getInfoLabel(label):
+    return ""
+
+
+def executebuiltin(command, wait=False):
+    pass
+
+
+class Monitor:
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        return True
+
+
+class Player:
+    def isPlaying(self):
+        return False
@@ -0,0 +1,27 @@
+"""Stand-in for Kodi's xbmcaddon module: the profile is CBTV_BENCH_PROFILE."""
+import os
+
+ADDON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "plugin.video.cbtv")
+
+
+class Addon:
+    def __init__(self, id=None):
+        self.id = id or "plugin.video.cbtv"
+
+    def getAddonInfo(self, key):
+        return {
+            "id": self.id,
+            "path": ADDON_PATH,
+            "profile": os.environ.get("CBTV_BENCH_PROFILE", ""),
+            "name": "CB TV",
+            "version": "bench",
+        }.get(key, "")
+
+    def getSetting(self, key):
+        return ""
+
+    def getSettingBool(self, key):
+        return False
+
+    def getLocalizedString(self, string_id):
+        return ""
@@ -0,0 +1,54 @@
+"""Stand-in for Kodi's xbmcgui module: dialogs never block and are recorded."""
+NOTIFICATION_INFO = "info"
+NOTIFICATION_WARNING = "warning"
+NOTIFICATION_ERROR = "error"
+
+DIALOGS = []
+
+
+class ListItem:
+    def __init__(self, label="", label2="", path="", offscreen=False):
+        self.label = label
+        self.path = path
+        self.art = {}
+        self.properties = {}
+        self.info = {}
+
+    def setArt(self, art):
+        self.art = dict(art)
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def setInfo(self, kind, info):
+        self.info[kind] = info
+
+    def setMimeType(self, mime):
+        self.properties["mimetype"] = mime
+
+    def setPath(self, path):
+        self.path = path
+
+    def getLabel(self):
+        return self.label
+
+
+class Dialog:
+    def ok(self, heading, message):
+        DIALOGS.append(("ok", heading, message))
+        return True
+
+    def notification(self, heading, message, icon=NOTIFICATION_INFO, time=5000, sound=True):
+        DIALOGS.append(("notification", heading, message))
+
+    def textviewer(self, heading, text, usemono=False):
+        DIALOGS.append(("textviewer", heading, text))
+
+    def input(self, heading, defaultt="", type=0, option=0, autoclose=0):
+        # No keyboard here: scenarios pass their query as a parameter
+        DIALOGS.append(("input", heading, defaultt))
+        return ""
+
+    def select(self, heading, items, autoclose=0, preselect=-1, useDetails=False):
+        DIALOGS.append(("select", heading, len(items)))
+        return -1
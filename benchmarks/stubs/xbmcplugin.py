@@ -0,0 +1,39 @@
+"""Stand-in for Kodi's xbmcplugin module: the listing handed to Kodi is recorded."""
+SORT_METHOD_NONE = 0
+SORT_METHOD_LABEL = 1
+SORT_METHOD_DATE = 3
+SORT_METHOD_UNSORTED = 40
+
+ITEMS = []
+RESOLVED = []
+ENDED = []
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    ITEMS.append((url, listitem, isFolder))
+    return True
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    ITEMS.extend(items)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    ENDED.append(succeeded)
+
+
+def setResolvedUrl(handle, succeeded, listitem):
+    RESOLVED.append((succeeded, listitem))
+
+
+def addSortMethod(handle, sortMethod, label2Mask=""):
+    pass
+
+
+def setContent(handle, content):
+    pass
+
+
+def setPluginCategory(handle, category):
+    pass
@@ -0,0 +1,15 @@
+"""Stand-in for Kodi's xbmcvfs module (paths are plain filesystem paths)."""
+import os
+
+
+def translatePath(path):
+    return path
+
+
+def exists(path):
+    return os.path.exists(path)
+
+
+def mkdirs(path):
+    os.makedirs(path, exist_ok=True)
+    return True
@@ -0,0 +1,77 @@
+"""
+Synthetic CDNLive catalogs and agenda events for the scalability benchmark.
+Deterministic for a given seed, and shaped like the real data: brand families
+with numbered sub-channels and quality variants, the country codes the addon
+groups by, and agenda events whose channel text names real-looking channels.
+"""
+import random
+
+COUNTRIES = ["it", "en", "es", "fr", "de", "pt", "us", "tr", "ro", "pl", "ar", "dk", "nl", "gr"]
+BRANDS = [
+    "Sky Sport", "Sky Sports", "DAZN", "Eurosport", "beIN Sports", "TNT Sports", "ESPN", "Rai",
+    "Canal+ Sport", "Movistar", "Sport TV", "Eleven Sports", "Fox Sports", "NBC Sports", "RMC Sport",
+    "Arena Sport", "Nova Sport", "Polsat Sport", "Digi Sport", "TV3 Sport", "Viaplay", "SuperSport",
+    "Premier Sports", "Setanta", "Match TV", "Sport1", "Sportitalia", "SuperTennis", "Cosmote Sport",
+]
+TOPICS = ["", "", "", "Calcio", "Football", "Tennis", "F1", "MotoGP", "Arena", "Action", "Golf", "Basket",
+          "NBA", "Volley", "Max", "Premium", "Extra", "News", "Racing", "Mix"]
+QUALITIES = ["", "", "", "HD", "FHD", "4K", "SD"]
+
+SPORTS = [
+    ("CALCIO", "Serie A"), ("CALCIO", "Premier League"), ("CALCIO", "LaLiga"), ("CALCIO", "Serie B"),
+    ("TENNIS", "ATP"), ("F1", "Gran Premio"), ("MOTOGP", "Gran Premio"), ("VOLLEY", "Superlega"),
+    ("BASKET", "Serie A"), ("CICLISMO", "Giro"),
+]
+TEAMS = [
+    "Inter", "Milan", "Juventus", "Roma", "Lazio", "Napoli", "Atalanta", "Fiorentina", "Torino", "Bologna",
+    "Arsenal", "Chelsea", "Liverpool", "Everton", "Brighton", "Real Madrid", "Barcellona", "Siviglia",
+    "Sinner", "Alcaraz", "Djokovic", "Medvedev", "Perugia", "Trento", "Virtus", "Olimpia",
+]
+# Channel names the agenda feed typically mentions (scraper.map_channels keywords among them)
+MENTIONS = ["Sky Sport Uno", "Sky Sport Calcio", "Sky Sport Tennis", "Sky Sport F1", "Sky Sport MotoGP",
+            "Sky Sport 251", "DAZN", "Eurosport 1", "Eurosport 2", "Rai 2", "Rai Sport", "SuperTennis",
+            "TV8", "Prime Video", "Sky Sport Arena", "Nove"]
+
+
+def channel_name(rng):
+    parts = [rng.choice(BRANDS), rng.choice(TOPICS)]
+    if rng.random() < 0.6:
+        parts.append(str(rng.choice([1, 2, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 24, 251, 252, 253])))
+    parts.append(rng.choice(QUALITIES))
+    return " ".join(p for p in parts if p)
+
+
+def make_channels(n, seed=1):
+    """Raw "channels" API payload with n channels"""
+    rng = random.Random(seed)
+    channels = []
+    for i in range(n):
+        name = channel_name(rng)
+        code = rng.choice(COUNTRIES)
+        slug = f"{name.lower().replace(' ', '-')}-{i}"
+        channels.append({
+            "name": name,
+            "code": code,
+            "url": f"https://cdn-live.tv/api/v1/channels/player/?name={slug}&code={code}&user=u&plan=vip",
+            "image": f"https://cdn-live.tv/img/{slug}.png",
+            "status": "online" if rng.random() < 0.85 else "offline",
+            "viewers": rng.randint(0, 5000),
+        })
+    return {"total_channels": n, "channels": channels}
+
+
+def make_events(n, seed=2):
+    """Parsed agenda events (scraper.get_oasport_events output) with n entries"""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n):
+        sport, league = rng.choice(SPORTS)
+        home, away = rng.sample(TEAMS, 2)
+        mentions = rng.sample(MENTIONS, rng.randint(1, 3))
+        events.append({
+            "time": f"{rng.randint(10, 23)}:{rng.choice(['00', '15', '30', '45'])}",
+            "sport": sport,
+            "title": f"{league}: {home}-{away}",
+            "channels_raw": "diretta tv su " + ", ".join(mentions),
+        })
+    return events
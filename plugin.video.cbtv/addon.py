@@ -1,50 +1,63 @@
+import time
+_T0 = time.perf_counter()
+
 import sys
-from urllib.parse import parse_qsl, urlencode
+import os
+from urllib.parse import parse_qsl
 import xbmcgui
 import xbmcplugin
-import json
-import re
-import xbmc
-from resources.lib.cdnlive import CDNLiveResolver
-from resources.lib.scraper import get_oasport_events, map_channels
+from resources.lib.listing import Listing
+from resources.lib.router import Router
 
-import xbmcaddon
-import os
+# Only the Kodi built-ins, the listing and the router (stdlib json, for its
+# timing record) are imported up front: the rest of resources.lib (caches,
+# artwork, requests) and re are imported by the actions that need them, and
+# no global touches the network or the addon settings at import time.
 
 # Global variables
-ADDON = xbmcaddon.Addon()
 ADDON_ID = 'plugin.video.cbtv'
 HANDLE = int(sys.argv[1])
 BASE_URL = sys.argv[0]
-resolver = CDNLiveResolver()
 
 # Ensure absolute path for fanart
-FANART = os.path.join(ADDON.getAddonInfo('path'), 'fanart.jpg')
-
-def build_url(query):
-    return f"{BASE_URL}?{urlencode(query)}"
+FANART = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fanart.jpg')
+
+router = Router(default="main_menu", t0=_T0)
+# Items are collected and submitted to Kodi in one call by end_directory()
+listing = Listing(HANDLE, BASE_URL, FANART, on_emit=router.item_emitted)
+
+_resolver = None
+
+def get_resolver():
+    global _resolver
+    if _resolver is None:
+        from resources.lib.cdnlive import CDNLiveResolver
+        _resolver = CDNLiveResolver()
+    return _resolver
+
+def load_stored(namespace, obj_id, legacy_json=None):
+    """Object referenced by a listing URL (legacy URLs, e.g. in favourites, still embed JSON)"""
+    if obj_id:
+        from resources.lib.store import ObjectStore
+        return ObjectStore(namespace).get(obj_id)
+    if legacy_json:
+        import json
+        return json.loads(legacy_json)
+    return None
+
+def stored_item_missing():
+    xbmcgui.Dialog().notification("CB TV", "Elemento scaduto, ricarica la lista", xbmcgui.NOTIFICATION_INFO)
+    end_directory(succeeded=False, cache_to_disc=False)
 
 def add_directory_item(title, query, is_folder=True, icon=None, is_playable=False):
-    url = build_url(query)
-    list_item = xbmcgui.ListItem(label=title)
-    
-    # Set default fanart for everything
-    art = {'fanart': FANART}
-    if icon:
-        art['icon'] = icon
-        art['thumb'] = icon
-    list_item.setArt(art)
+    listing.add(title, query, is_folder=is_folder, icon=icon, is_playable=is_playable)
 
-    if is_playable:
-        list_item.setProperty('IsPlayable', 'true')
-    xbmcplugin.addDirectoryItem(handle=HANDLE, url=url, listitem=list_item, isFolder=is_folder)
+def end_directory(succeeded=True, sort_methods=None, cache_to_disc=True):
+    listing.end(succeeded=succeeded, sort_methods=sort_methods, cache_to_disc=cache_to_disc)
 
+@router.route("main_menu")
 def main_menu():
     xbmcplugin.setContent(HANDLE, 'videos')
-    # Diagnostic count
-    all_ch = resolver.get_channels()
-    online_count = len(all_ch)
-    
     add_directory_item(f"Agenda Sportiva (Eventi di Oggi)", {"action": "list_agenda"})
     
     # Canali Sport Italia
@@ -54,9 +67,23 @@ def main_menu():
     add_directory_item("[COLOR yellow][B]Canali Cinema & Serie TV[/B][/COLOR]", {"action": "list_premium_menu"})
     
     add_directory_item(f"Canali per Sport", {"action": "list_sport_channels_menu"})
-    add_directory_item(f"Tutte le TV Live ({online_count} Canali Online)", {"action": "list_countries"})
+
+    add_directory_item("Cerca Canali ed Eventi", {"action": "search"})
+
+    # Diagnostic count: cosmetic, so it comes from the cache only and never blocks the menu
+    resolver = get_resolver()
+    online_count = resolver.get_cached_channel_count()
+    if online_count is not None:
+        add_directory_item(f"Tutte le TV Live ({online_count} Canali Online)", {"action": "list_countries"})
+    else:
+        add_directory_item("Tutte le TV Live", {"action": "list_countries"})
     
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
+
+    # Nothing cached yet: load the catalog now that the menu is on screen,
+    # so the count (and every channel listing) is ready for the next visit
+    if online_count is None:
+        resolver.get_channels()
 
 # --- PREMIUM (MANDRAKODI SOURCE) ---
 
@@ -65,29 +92,38 @@ PREMIUM_URL = "https://test34344.herokuapp.com/filter.php"
 PREMIUM_UA = "MandraKodi2@@1.1.2@@MandraKodi3@@S63TDC"
 PROTECTION_KEY = "amstaff@@"
 
-def list_premium_menu():
-    import requests
+def fetch_premium(timeout=10):
     url = f"{PREMIUM_URL}?numTest=A1A260"
     headers = {"User-Agent": PREMIUM_UA}
-    
+    from resources.lib import httpclient
+    r = httpclient.get(url, headers=headers, timeout=timeout)
+    return r.json()
+
+@router.route("list_premium_menu")
+def list_premium_menu():
     try:
-        r = requests.get(url, headers=headers, timeout=10)
-        data = r.json()
+        data = fetch_premium()
         sections = data.get("channels", [])
+        from resources.lib.store import ObjectStore
+        store = ObjectStore("premium")
         
         for sec in sections:
             name = sec.get("name", "Unknown Group")
             # Filter specifically for the groups requested by the user
             if any(k in name.upper() for k in ["INTRATTENIMENTO", "CINEMA", "BAMBINI"]):
-                add_directory_item(name, {"action": "list_premium_category", "cat_data": json.dumps(sec)})
+                add_directory_item(name, {"action": "list_premium_category", "cat_id": store.put(sec)})
+        store.prune()
                 
     except Exception as e:
         xbmcgui.Dialog().ok("Errore Premium", f"Impossibile caricare i canali Premium: {str(e)}")
         
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
 
-def list_premium_category(cat_data):
-    sec = json.loads(cat_data)
+@router.route("list_premium_category", cat_id=str, cat_data=str)
+def list_premium_category(cat_id, cat_data=None):
+    sec = load_stored("premium", cat_id, cat_data)
+    if sec is None:
+        return stored_item_missing()
     items = sec.get("items", [])
     
     for it in items:
@@ -104,8 +140,9 @@ def list_premium_category(cat_data):
                 icon=it.get("thumbnail")
             )
             
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
 
+@router.route("play_premium", payload=str, title=str)
 def play_premium(payload, title):
     import base64
     
@@ -149,96 +186,97 @@ def play_premium(payload, title):
     except Exception as e:
         xbmcgui.Dialog().notification("Errore Play", f"Errore decodifica: {str(e)}", xbmcgui.NOTIFICATION_ERROR)
 
+@router.route("debug_api")
 def debug_api():
-    data = resolver.fetch_api("channels")
+    resolver = get_resolver()
+    data = resolver.fetch_api("channels", use_cache=False)
     if not data:
-        xbmcgui.Dialog().ok("Debug API", "API returned NONE or Empty. Check Internet/VPN.")
+        lines = ["API returned NONE or Empty. Check Internet/VPN."]
     else:
         ch_list = data.get("channels", [])
         online = [c for c in ch_list if c.get("status") == "online"]
-        xbmcgui.Dialog().ok("Debug API", f"Total: {len(ch_list)}\nOnline: {len(online)}\nUser: {resolver.user}")
+        lines = [f"Total: {len(ch_list)}  Online: {len(online)}  User: {resolver.user}"]
+
+    # Rolling HTTP metrics: tells a slow upstream apart from a slow addon
+    from resources.lib import metrics
+    summary = metrics.summarize(metrics.load())
+    lines += ["", f"[B]Upstream (ultime {metrics.WINDOW_HOURS}h)[/B]"]
+    for host, st in sorted(summary["hosts"].items(), key=lambda x: -x[1]["requests"]):
+        lines.append(
+            f"{host}: {st['requests']} req, p50 {st['p50']}ms, p95 {st['p95']}ms, "
+            f"errori {st['error_rate']:.0%} ({st['errors']}), 304 {st['not_modified']}, "
+            f"retry {st['retries']}, {st['bytes'] // 1024} KB")
+    if not summary["hosts"]:
+        lines.append("Nessuna richiesta registrata")
+    from resources.lib import health
+    for host, st in sorted(health.status().items()):
+        state = "[COLOR red]APERTO[/COLOR]" if st["open"] else "chiuso"
+        lines.append(f"{host}: circuito {state}, timeout {st['timeout']:.1f}s, errori consecutivi {st['failures']}")
+    lines += ["", "[B]Cache[/B]"]
+    for key, outcomes in sorted(summary["cache"].items()):
+        lines.append(f"{key}: " + ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+    xbmcgui.Dialog().textviewer("CB TV Diagnostics", "\n".join(lines))
 
 # --- AGENDA (SCRAPER) ---
 
+@router.route("list_agenda")
 def list_agenda():
-    events = get_oasport_events()
+    # oasport feed + CDNLive events, fetched in parallel and deduplicated
+    from resources.lib.agenda import get_unified_agenda
+    events = get_unified_agenda(get_resolver())
     if not events:
         xbmcgui.Dialog().notification("Agenda", "No events found today", xbmcgui.NOTIFICATION_INFO)
-        xbmcplugin.endOfDirectory(HANDLE)
+        end_directory()
         return
     
-    # User preferred sports: keep 'calcio' to catch all soccer, then filter by league/exclusion
-    requested_sports = ["calcio", "tennis", "volley", "pallavolo", "f1", "motor", "motogp"]
+    # Keyword lists live in resources/data/rules.json ("agenda" section)
+    from resources.lib.agenda import save_widget_agenda, select_events
+    from resources.lib.rules import get_rules
+    rules = get_rules()
+
+    from resources.lib.store import ObjectStore
+    store = ObjectStore("events")
+    listed = {}
+    for ev in select_events(events, rules):
+        title = f"{ev['time']} | {ev['sport']}: {ev['title']}"
+        event_id = store.put(ev)
+        listed[event_id] = ev
+        add_directory_item(title, {"action": "resolve_agenda_event", "event_id": event_id}, is_folder=True)
+
+    store.prune()
+    end_directory()
+    save_widget_agenda(listed)
+
+    # The listing is on screen: match all its events against the channel
+    # snapshot now, so opening one of them is a plain lookup
+    from resources.lib.matching import EventMatches
+    EventMatches().precompute(listed, get_resolver(), rules)
+
+@router.route("resolve_agenda_event", event_id=str, event_data=str)
+def resolve_agenda_event(event_id, event_data=None):
+    import re
+    resolver = get_resolver()
+    ev = load_stored("events", event_id, event_data)
+    if ev is None:
+        return stored_item_missing()
     
-    # Explicitly exclude these to clean up the agenda
-    excluded_keywords = [
-        "ciclismo", "scialpinismo", "sci alpino", "biathlon", "rugby", "basket", 
-        "atletica", "nuoto", "pallaman", "pallanuoto", "calcio a 5", "futsal",
-        "serie b", "serie c", "lega pro", "calcio femminile"
-    ]
+    from resources.lib.matching import EventMatches, group_by_country, match_event_channels
+    from resources.lib.store import ObjectStore
+    event_id = event_id or ObjectStore.make_id(ev)
+    groups = EventMatches().get(event_id, resolver.get_snapshot_version("channels"))
     
-    # Strictly soccer leagues requested by the user + major ones
-    important_leagues = [
-        "serie a", "la liga", "premier league", "champions league", "europa league", 
-        "laliga", "bundesliga", "ligue 1", "league 1", "eredivisie", "liga", "premier"
-    ]
-
-    items_added = 0
-    # Use a set to prevent showing the exact same event multiple times
-    seen_events = set()
+    # Fetch what is needed at the same time (the channel list only if not precomputed)
+    from resources.lib.parallel import fetch_all
+    tasks = {"premium": lambda: fetch_premium(timeout=5)}
+    if groups is None:
+        tasks["channels"] = resolver.get_channels
+    sources = fetch_all(tasks)
     
-    for ev in events:
-        sport_lower = ev['sport'].lower()
-        title_lower = ev['title'].lower()
-        event_key = f"{ev['time']}_{ev['sport']}_{ev['title']}"
-        
-        if event_key in seen_events: continue
-
-        # 1. Check if it's an excluded sport or specifically excluded soccer league
-        if any(ex in sport_lower or ex in title_lower for ex in excluded_keywords):
-            continue
-            
-        # 2. Check if it's a requested sport
-        is_requested_sport = any(req in sport_lower for req in requested_sports)
-        
-        # 3. Check if it's one of the requested SOCCER leagues (extra safety)
-        is_important_soccer = any(league in title_lower or league in sport_lower for league in important_leagues)
-        
-        # Special case: F1/MotoGP might be in title
-        is_motor_title = any(req in title_lower for req in ["f1", "motogp"])
-
-        # Inclusion logic: 
-        # - If it's Calcio, it MUST be an important league
-        # - If it's other requested sports, show them
-        show_event = False
-        if "calcio" in sport_lower:
-            if is_important_soccer:
-                show_event = True
-        elif is_requested_sport or is_motor_title:
-            show_event = True
-
-        if show_event:
-            title = f"{ev['time']} | {ev['sport']}: {ev['title']}"
-            add_directory_item(title, {"action": "resolve_agenda_event", "event_data": json.dumps(ev)}, is_folder=True)
-            items_added += 1
-            seen_events.add(event_key)
-            
-    # FALLBACK: If no requested sports found, show all events (but still respect exclusions if possible)
-    if items_added == 0:
-        for ev in events:
-            sport_lower = ev['sport'].lower()
-            if not any(ex in sport_lower for ex in excluded_keywords):
-                title = f"{ev['time']} | {ev['sport']}: {ev['title']}"
-                add_directory_item(title, {"action": "resolve_agenda_event", "event_data": json.dumps(ev)}, is_folder=True)
-            
-    xbmcplugin.endOfDirectory(HANDLE)
-
-def resolve_agenda_event(event_data):
-    ev = json.loads(event_data)
+    from resources.lib.rules import get_rules
+    rules = get_rules()
     
     # --- 1. PREMIUM CHANNELS FETCH & MATCH ---
     try:
-        import requests
         channels_raw = ev.get('channels_raw', [])
         
         # Fix: if channels_raw is a string, wrap it in a list
@@ -247,10 +285,12 @@ def resolve_agenda_event(event_data):
         
         required_channels = [c.lower().strip() for c in channels_raw if c]
         
-        url = f"{PREMIUM_URL}?numTest=A1A260"
-        headers = {"User-Agent": PREMIUM_UA}
-        r = requests.get(url, headers=headers, timeout=5)
-        data = r.json()
+        data = sources["premium"] or {}
+        
+        # Sport context of the event (calcio, motori, tennis, basket o generico)
+        premium_sport = rules.detect("premium", ev.get('sport', ''))
+        premium_include = f"premium.channels.{premium_sport}.include"
+        premium_exclude = f"premium.channels.{premium_sport}.exclude"
         
         for sec in data.get("channels", []):
             # WHITELIST: Mostra SOLO le sezioni SPORT (invece di blacklist)
@@ -277,51 +317,16 @@ def resolve_agenda_event(event_data):
                          break
                 
                 # 2. CONTEXT FALLBACK (Se non c'è match esatto, usa la logica dello sport)
+                # Liste per sport in rules.json ("premium"): include e poi escludi categoricamente
                 if not is_match:
-                    sport_type = ev.get('sport', '').lower()
+                    title_cats = rules.match(p_title_clean)
                     
                     # ESCLUSIONE GLOBALE: Sport 24 è un TG, non una partita
-                    if "sport 24" in p_title_clean:
+                    if "premium.always_exclude" in title_cats:
                         continue
                     
-                    # LOGICA CALCIO
-                    if "calcio" in sport_type or "serie" in sport_type or "champions" in sport_type:
-                        # Includi canali calcistici probabili
-                        if any(k in p_title_clean for k in ["calcio", "sport uno", "dazn", "sport 1", "sport 25", "sport 2", "diretta"]):
-                            is_match = True
-                        # MA escludi categoricamente altri sport
-                        if any(k in p_title_clean for k in ["tennis", "basket", "f1", "motogp", "golf", "rugby", "cricket", "nba", "volley"]):
-                            is_match = False
-                            
-                    # LOGICA MOTORI
-                    elif "motor" in sport_type or "f1" in sport_type or "moto" in sport_type:
-                        if any(k in p_title_clean for k in ["f1", "motogp", "motor", "race"]):
-                            is_match = True
-                        if any(k in p_title_clean for k in ["calcio", "basket", "tennis"]):
-                            is_match = False
-
-                    # LOGICA TENNIS    
-                    elif "tennis" in sport_type:
-                        if any(k in p_title_clean for k in ["tennis", "eurosport", "sport uno"]):
-                            is_match = True
-                        if any(k in p_title_clean for k in ["calcio", "motogp", "f1", "basket"]):
-                            is_match = False
-                            
-                    # LOGICA BASKET
-                    elif "basket" in sport_type:
-                         if any(k in p_title_clean for k in ["basket", "nba", "euroleague"]):
-                            is_match = True
-                         if any(k in p_title_clean for k in ["calcio", "tennis"]):
-                            is_match = False
-                            
-                    # FALLBACK GENERICO (Se non è uno sport specifico sopra)
-                    else:
-                        # Mostra tutto ciò che è Sport generico ma non specifico di altri
-                        if "sport" in p_title_clean:
-                             is_match = True
-
+                    is_match = premium_include in title_cats and premium_exclude not in title_cats
 
-                
                 if is_match:
                     resolve_val = p_item.get("myresolve", "")
                     if PROTECTION_KEY in resolve_val:
@@ -346,99 +351,17 @@ def resolve_agenda_event(event_data):
         pass
 
     # --- 2. STANDARD CHANNELS (CDNLive) ---
-    all_channels = resolver.get_channels()
-    
-    sport_kw = ev['sport'].lower()
-    search_text = ev['title'].lower()
-    
-    # Extract team/athlete keywords
-    keywords = re.split(r'[-–—:,\s]+', search_text)
-    keywords = [kw for kw in keywords if len(kw) > 3]
-    
-    # 1. High Priority: Channels explicitly mentioned OR matching team names
-    priority_matches = map_channels(ev['channels_raw'], all_channels)
-    
-    if keywords:
-        for ch in all_channels:
-            name = ch.get("name", "").lower()
-            if any(kw in name for kw in keywords):
-                priority_matches.append(ch)
-
-    # 2. Medium Priority: Jolly matches based on sport context
-    jolly_matches = []
-    
-    # Define what to include and what to EXCLUDE based on sport
-    include_kws = []
-    exclude_kws = []
-    
-    if any(s in sport_kw for s in ["calcio", "soccer"]):
-        include_kws = ["sky sport", "bein", "dazn", "tnt sport", "sport tv", "astro", "supersport", "eleven", "canal+", "ziggo", "premier", "la liga"]
-        exclude_kws = ["tennis", "f1", "moto", "golf", "cricket", "rugby", "nba", "basket", "racing", "volleyball"]
-        # Special handling: for soccer, we want "Sky Sport Football", "Sky Sport Calcio", or just "Sky Sport 1"
-    elif "tennis" in sport_kw:
-        include_kws = ["tennis", "euro sport", "eurosport", "sky sport tennis", "beIN sport"]
-        exclude_kws = ["football", "calcio", "f1", "motor", "golf", "nba"]
-    elif any(s in sport_kw for s in ["f1", "motor", "moto"]):
-        include_kws = ["sky sport f1", "sky sport motogp", "dazn f1", "motor", "race", "servus"]
-        exclude_kws = ["calcio", "football", "tennis", "golf", "basket"]
-    else:
-        # Default fallback
-        include_kws = ["sky sport", "euro sport", "eurosport"]
-
-    for ch in all_channels:
-        name = ch.get("name", "").lower()
-        
-        # Check if it's a potential broadcaster match
-        if any(ikw in name for ikw in include_kws):
-            # STRICT EXCLUSION: If it's a soccer match and it says "Tennis", skip it
-            if any(ekw in name for ekw in exclude_kws):
-                continue
-            
-            # ANTI-SPAM: Limit numbered channels (Sky Sport 3, 4... beIN 5, 6...)
-            # unless it's a priority match already
-            is_generic = True
-            if any(kw in name for kw in keywords): 
-                is_generic = False
-            
-            if is_generic:
-                # Only keep main channels (1, 2) or unnumbered ones
-                # Skip if it contains numbers from 3 to 251 (251+ are usually backup/event channels)
-                if any(f" {n}" in name for n in range(3, 251)):
-                    continue
-                # Also skip specific numbered sub-channels like "beIN 4", "Sky 5" etc
-                if re.search(r'\s[3-9]\b', name) or re.search(r'[a-z][3-9]\b', name):
-                    continue
-
-            jolly_matches.append(ch)
-
-    # Combine and Deduplicate
-    all_found = priority_matches + jolly_matches
-    seen_urls = set()
-    seen_names = set()
-    unique_matches = []
-    
-    for m in all_found:
-        m_url = m.get('url')
-        m_id = f"{m.get('code')}_{m.get('name')}".lower()
-        if m_url not in seen_urls and m_id not in seen_names:
-            unique_matches.append(m)
-            seen_urls.add(m_url)
-            seen_names.add(m_id)
-
-    # Group by Country
-    by_country = {}
-    for ch in unique_matches:
-        country = ch.get('code', '??').upper()
-        if country not in by_country: by_country[country] = []
-        by_country[country].append(ch)
-
-    sorted_countries = sorted(by_country.keys(), key=lambda x: (x != 'IT', x))
-
-    for country in sorted_countries:
-        if len(sorted_countries) > 1:
+    # Precomputed by list_agenda for this channel snapshot, else matched now
+    if groups is None:
+        all_channels = sources["channels"] or []
+        index = resolver.get_channel_index(all_channels)
+        groups = group_by_country(match_event_channels(ev, index, rules))
+
+    for country, country_channels in groups:
+        if len(groups) > 1:
             add_directory_item(f"[COLOR yellow][B]--- {country} CHANNELS ---[/B][/COLOR]", {"action": "ignore"}, is_folder=False)
             
-        for ch in by_country[country]:
+        for ch in country_channels:
             add_directory_item(
                 f"    {ch.get('name')}",
                 {"action": "play_internal", "url": ch.get("url"), "title": ch.get("name")},
@@ -447,44 +370,37 @@ def resolve_agenda_event(event_data):
                 icon=ch.get("image")
             )
     
-    if not unique_matches:
+    if not groups:
         xbmcgui.Dialog().notification("Guide", "No channels found for this event", xbmcgui.NOTIFICATION_INFO)
     
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
 
 # --- SOCCER (DIRECT) ---
 
+@router.route("list_soccer")
 def list_soccer():
-    data = resolver.get_sports_categories()
-    # The API uses "Soccer" (Capitalized)
-    events = data.get("Soccer", [])
-    if not events:
-         events = data.get("soccer", [])
+    # Indexed by sport and tournament once per events/sports snapshot
+    sports = get_resolver().get_sports_events()
     
-    soccer_whitelist = ["serie a", "premier league", "la liga", "champions league", "europa league", "laliga", "serie b", "ligue 1"]
-    tournaments = {}
-    for ev in events:
-        tourn = ev.get("tournament", "Other")
-        tourn_lower = tourn.lower()
-        if any(req in tourn_lower for req in soccer_whitelist):
-            if tourn not in tournaments: tournaments[tourn] = []
-            tournaments[tourn].append(ev)
+    # Whitelisted leagues: rules.json, "soccer_leagues"
+    from resources.lib.rules import get_rules
+    rules = get_rules()
+    tournaments = [t for t in sports.tournaments("Soccer") if "soccer_leagues" in rules.match(t)]
     
-    for tourn in sorted(tournaments.keys()):
+    for tourn in tournaments:
         add_directory_item(tourn, {"action": "list_tournament_matches", "category": "Soccer", "tournament": tourn})
     
     if not tournaments:
          xbmcgui.Dialog().notification("Soccer", "No whitelisted leagues live now", xbmcgui.NOTIFICATION_INFO)
          
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory(sort_methods=[xbmcplugin.SORT_METHOD_LABEL])
 
+@router.route("list_tournament_matches", category=(str, "Soccer"), tournament=str)
 def list_tournament_matches(category, tournament):
-    data = resolver.get_sports_categories()
-    # Handle category case sensitivity
-    events = data.get("Soccer", [])
-    if not events: events = data.get("soccer", [])
-    
-    filtered = [ev for ev in events if ev.get("tournament") == tournament]
+    # Dict lookup in the same index list_soccer used: no refetch, no scan
+    filtered = get_resolver().get_sports_events().matches(category, tournament)
+    from resources.lib.store import ObjectStore
+    store = ObjectStore("matches")
     
     for ev in filtered:
         # Check if at least one channel in the event is online (if status is available)
@@ -495,39 +411,24 @@ def list_tournament_matches(category, tournament):
         
         if online_channels:
             title = f"{ev.get('time', 'Live')} - {ev.get('homeTeam')} vs {ev.get('awayTeam')}"
-            add_directory_item(title, {"action": "resolve_match_menu", "match_data": json.dumps(ev)}, is_folder=True)
-    xbmcplugin.endOfDirectory(HANDLE)
+            add_directory_item(title, {"action": "resolve_match_menu", "match_id": store.put(ev)}, is_folder=True)
+    store.prune()
+    end_directory()
 
 # --- CHANNELS BY SPORT ---
 
+@router.route("list_sport_channels_menu")
 def list_sport_channels_menu():
     add_directory_item("Calcio", {"action": "list_sport_channels", "sport": "calcio"})
     add_directory_item("Tennis", {"action": "list_sport_channels", "sport": "tennis"})
     add_directory_item("Motori (F1/MotoGP)", {"action": "list_sport_channels", "sport": "motor"})
     add_directory_item("Volley", {"action": "list_sport_channels", "sport": "volley"})
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
 
+@router.route("list_sport_channels", sport=str)
 def list_sport_channels(sport):
-    all_channels = resolver.get_channels()
-    sport_keywords = {
-        "calcio": ["calcio", "football", "soccer", "serie a", "premier", "liga", "bein", "sky sport calcio", "dazn", "astro", "supersport", "sport tv"],
-        "tennis": ["tennis", "euro sport", "eurosport", "supertennis", "tsn", "polsat"],
-        "motor": ["f1", "motogp", "motor", "racing", "servus"],
-        "volley": ["volley", "pallavolo", "polsat", "trt", "vbtv", "rai sport"]
-    }
-    kws = sport_keywords.get(sport, [])
-    found = []
-    seen = set()
-    for ch in all_channels:
-        name = ch.get("name", "").lower()
-        if any(kw in name for kw in kws):
-            # De-duplicate
-            ch_id = f"{ch.get('code')}_{ch.get('name')}".lower()
-            if ch_id not in seen:
-                found.append(ch)
-                seen.add(ch_id)
-            
-    for ch in sorted(found, key=lambda x: x.get('name')):
+    # Prebuilt in the catalog snapshot: already deduplicated and sorted by name
+    for ch in get_resolver().get_sport_channels(sport):
         add_directory_item(
             f"[{ch.get('code','??').upper()}] {ch.get('name')}",
             {"action": "play_internal", "url": ch.get("url"), "title": ch.get("name")},
@@ -535,25 +436,123 @@ def list_sport_channels(sport):
             is_playable=True,
             icon=ch.get("image")
         )
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory(sort_methods=[xbmcplugin.SORT_METHOD_UNSORTED, xbmcplugin.SORT_METHOD_LABEL])
+
+# --- SEARCH ---
+
+@router.route("search", query=str)
+def search(query=None):
+    query = (query or "").strip()
+    if not query:
+        query = xbmcgui.Dialog().input("Cerca canali ed eventi").strip()
+        end_directory(succeeded=False)
+        if query:
+            # The results get their own URL (replacing this one in the history):
+            # going back to them lists them again instead of prompting anew
+            import xbmc
+            xbmc.executebuiltin(f"Container.Update({listing.build_url({'action': 'search', 'query': query})},replace)")
+        return
+
+    # Channel names and event titles are FTS-indexed in the local catalog database
+    from resources.lib.catalog_db import CatalogDB
+    db = CatalogDB()
+    try:
+        db.sync(get_resolver())
+        events = db.search_events(query)
+        channels = db.search_channels(query)
+    finally:
+        db.close()
+
+    from resources.lib.store import ObjectStore
+    store = ObjectStore("matches")
+    for ev in events:
+        title = f"[COLOR gold]{ev.get('time', 'Live')}[/COLOR] - {ev.get('homeTeam')} vs {ev.get('awayTeam')} ({ev.get('tournament', '')})"
+        add_directory_item(title, {"action": "resolve_match_menu", "match_id": store.put(ev)}, is_folder=True)
+    for ch in channels:
+        add_directory_item(
+            f"[{ch.get('code','??').upper()}] {ch.get('name')}",
+            {"action": "play_internal", "url": ch.get("url"), "title": ch.get("name")},
+            is_folder=False,
+            is_playable=True,
+            icon=ch.get("image")
+        )
+
+    if not events and not channels:
+        xbmcgui.Dialog().notification("Cerca", f"Nessun risultato per '{query}'", xbmcgui.NOTIFICATION_INFO)
+    # Results depend on the live catalog: never reuse a cached rendering
+    end_directory(cache_to_disc=False)
+
+# --- WIDGETS ---
+# Skin home screen widgets: built from the disk cache only (the service keeps
+# it filled), never the network or a dialog, and cut off at WIDGET_BUDGET so a
+# widget refresh stays cheap. A full listing is cached to disc by Kodi; an
+# empty one is not, so the next refresh picks up the data once it exists.
+
+WIDGET_BUDGET = 0.15  # seconds spent building items before the rest is dropped
+
+@router.route("widget_next_events", limit=(int, 10))
+def widget_next_events(limit):
+    import datetime
+    from resources.lib.agenda import widget_agenda
+    deadline = time.perf_counter() + WIDGET_BUDGET
+    # Events that started up to two hours ago are likely still on
+    now = datetime.datetime.now()
+    since = max(now - datetime.timedelta(hours=2), now.replace(hour=0, minute=0)).strftime("%H:%M")
+    xbmcplugin.setContent(HANDLE, 'videos')
+    added = 0
+    for ev in widget_agenda():
+        if added >= limit or time.perf_counter() > deadline:
+            break
+        if ev["time"] and ev["time"] < since:
+            continue
+        add_directory_item(f"{ev['time']} | {ev['sport']}: {ev['title']}",
+                           {"action": "resolve_agenda_event", "event_id": ev["id"]}, is_folder=True)
+        added += 1
+    end_directory()
+
+@router.route("widget_live_channels", country=(str, "Italy"), limit=(int, 30))
+def widget_live_channels(country, limit):
+    deadline = time.perf_counter() + WIDGET_BUDGET
+    catalog = get_resolver().get_cached_catalog()
+    channels = catalog.by_country.get(country, []) if catalog else []
+    xbmcplugin.setContent(HANDLE, 'videos')
+    # Most watched first: a widget only shows the top of the list
+    for ch in sorted(channels, key=lambda c: -(c.get("viewers") or 0))[:limit]:
+        if time.perf_counter() > deadline:
+            break
+        add_directory_item(
+            ch.get("name"),
+            {"action": "play_internal", "url": ch.get("url"), "title": ch.get("name")},
+            is_folder=False,
+            is_playable=True,
+            icon=ch.get("image")
+        )
+    end_directory()
 
 # --- LIVE TV ---
 
+@router.route("list_countries")
 def list_countries():
+    resolver = get_resolver()
     grouped = resolver.get_channels_grouped()
     for country in sorted(grouped.keys()):
         add_directory_item(country, {"action": "list_country_channels", "country": country})
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory(sort_methods=[xbmcplugin.SORT_METHOD_LABEL])
+
+@router.route("list_country_channels", country=str)
+def list_country_channels(country):
+    resolver = get_resolver()
+    # Italy also needs the Premium catalog: fetch it alongside the CDNLive one
+    tasks = {"grouped": resolver.get_channels_grouped}
+    if country.lower() == "italy":
+        tasks["premium"] = fetch_premium
+    from resources.lib.parallel import fetch_all
+    sources = fetch_all(tasks)
 
-def list_country_channels(country_name):
     # 1. If Italy, add Premium Sport channels from Mandrakodi
-    if country_name.lower() == "italy":
-        import requests
-        url = f"{PREMIUM_URL}?numTest=A1A260"
-        headers = {"User-Agent": PREMIUM_UA}
+    if sources.get("premium"):
+        data = sources["premium"]
         try:
-            r = requests.get(url, headers=headers, timeout=10)
-            data = r.json()
             sections = data.get("channels", [])
             for sec in sections:
                 if "SPORT" in sec.get("name", "").upper():
@@ -576,8 +575,8 @@ def list_country_channels(country_name):
             pass # Fallback to standard channels if remote fails
 
     # 2. Add standard channels from CDNLive
-    grouped = resolver.get_channels_grouped()
-    channels = grouped.get(country_name, [])
+    grouped = sources["grouped"] or {}
+    channels = grouped.get(country, [])
     for ch in channels:
         add_directory_item(
             ch.get("name", "Unknown"),
@@ -585,12 +584,15 @@ def list_country_channels(country_name):
             is_folder=True,
             icon=ch.get("image")
         )
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory(sort_methods=[xbmcplugin.SORT_METHOD_UNSORTED, xbmcplugin.SORT_METHOD_LABEL])
 
 # --- HELPERS ---
 
-def resolve_match_menu(match_data):
-    ev = json.loads(match_data)
+@router.route("resolve_match_menu", match_id=str, match_data=str)
+def resolve_match_menu(match_id, match_data=None):
+    ev = load_stored("matches", match_id, match_data)
+    if ev is None:
+        return stored_item_missing()
     channels = ev.get("channels", [])
     for ch in channels:
         add_directory_item(
@@ -600,13 +602,21 @@ def resolve_match_menu(match_data):
             is_playable=True,
             icon=ch.get("image")
         )
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
+
+@router.route("ignore")
+def ignore():
+    # Separator rows (e.g. "--- IT CHANNELS ---") are not meant to do anything
+    pass
 
+@router.route("resolve_menu", url=str, title=str)
 def resolve_menu(url, title):
     add_directory_item("[COLOR gold]PLAY STREAM[/COLOR]", {"action": "play_internal", "url": url, "title": title}, is_folder=False, is_playable=True)
-    xbmcplugin.endOfDirectory(HANDLE)
+    end_directory()
 
+@router.route("play_internal", url=str, title=str)
 def play_internal(url, title):
+    resolver = get_resolver()
     resolved_url = resolver.resolve(url)
     if not resolved_url:
         xbmcgui.Dialog().notification("Error", "Could not resolve stream", xbmcgui.NOTIFICATION_ERROR)
@@ -621,21 +631,4 @@ def play_internal(url, title):
     xbmcplugin.setResolvedUrl(HANDLE, True, listitem=list_item)
 
 if __name__ == '__main__':
-    params = dict(parse_qsl(sys.argv[2][1:]))
-    action = params.get('action')
-    if not action: main_menu()
-    elif action == 'list_agenda': list_agenda()
-    elif action == 'debug_api': debug_api()
-    elif action == 'resolve_agenda_event': resolve_agenda_event(params.get('event_data'))
-    elif action == 'list_soccer': list_soccer()
-    elif action == 'list_tournament_matches': list_tournament_matches(params.get('category'), params.get('tournament'))
-    elif action == 'list_sport_channels_menu': list_sport_channels_menu()
-    elif action == 'list_sport_channels': list_sport_channels(params.get('sport'))
-    elif action == 'list_countries': list_countries()
-    elif action == 'list_country_channels': list_country_channels(params.get('country'))
-    elif action == 'list_premium_menu': list_premium_menu()
-    elif action == 'list_premium_category': list_premium_category(params.get('cat_data'))
-    elif action == 'play_premium': play_premium(params.get('payload'), params.get('title'))
-    elif action == 'resolve_match_menu': resolve_match_menu(params.get('match_data'))
-    elif action == 'resolve_menu': resolve_menu(params.get('url'), params.get('title'))
-    elif action == 'play_internal': play_internal(params.get('url'), params.get('title'))
+    router.dispatch(dict(parse_qsl(sys.argv[2][1:])))
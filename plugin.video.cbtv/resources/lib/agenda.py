@@ -0,0 +1,233 @@
+import datetime
+import re
+import unicodedata
+
+import xbmc
+
+# Unified agenda: every event source is fetched at the same time, normalized to
+# the record the agenda screens already use ({"time", "sport", "title",
+# "channels_raw"} + "sources") and merged, so one event listed by two sources
+# is shown once with the channels of both.
+
+# CDNLive sport categories -> the Italian labels of the feed (rules.json "agenda" keywords)
+SPORT_NAMES = {
+    "soccer": "CALCIO", "football": "CALCIO", "tennis": "TENNIS", "basketball": "BASKET",
+    "volleyball": "VOLLEY", "motorsport": "F1", "formula 1": "F1", "motogp": "MOTOGP",
+    "ice hockey": "HOCKEY", "rugby": "RUGBY", "cycling": "CICLISMO", "handball": "PALLAMANO",
+}
+
+TIME_RE = re.compile(r'(\d{1,2})[:.](\d{2})')
+TEAMS_RE = re.compile(r'\s*[-–—]\s*|\s+vs\.?\s+', re.IGNORECASE)
+WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+def _norm_time(value):
+    m = TIME_RE.search(value or "")
+    return f"{int(m.group(1)):02d}:{m.group(2)}" if m else ""
+
+
+def _norm_name(name):
+    """Team/athlete name as a comparable token: no accents, case or punctuation"""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return WORD_RE.sub("", name.lower())
+
+
+def _teams(title):
+    """["inter", "milan"] from "Serie A: Inter-Milan" (empty for events without sides)"""
+    sides = TEAMS_RE.split(title.rsplit(":", 1)[-1].strip())
+    teams = [_norm_name(s) for s in sides if s.strip()]
+    return teams if len(teams) >= 2 else []
+
+
+def from_cdnlive(ev, sport):
+    """A CDNLive events/sports entry as an agenda record"""
+    names = [ch.get("channel_name") for ch in ev.get("channels", []) if ch.get("channel_name")]
+    tournament = ev.get("tournament") or sport
+    return {
+        "time": _norm_time(ev.get("time")),
+        "sport": SPORT_NAMES.get(sport.lower(), sport.upper()),
+        "title": f"{tournament}: {ev.get('homeTeam')}-{ev.get('awayTeam')}",
+        "channels_raw": ", ".join(names),
+    }
+
+
+def _add_channels(target, ev):
+    """Channels named by either record, without repeating a mention"""
+    known = {c.strip().lower() for c in target["channels_raw"].split(",")}
+    extra = [c.strip() for c in ev.get("channels_raw", "").split(",")
+             if c.strip() and c.strip().lower() not in known]
+    if extra:
+        target["channels_raw"] = ", ".join(filter(None, [target["channels_raw"]] + extra))
+
+
+def merge(sources):
+    """
+    Dedupe the events of every source (in priority order: the first source's
+    wording wins). Within a source only exact (time, sport, title) repeats are
+    dropped. Across sources two records are the same event when time and sport
+    match and so do both sides (or the whole title, for events without sides);
+    failing that, a single shared side is enough, so "Barcellona" and
+    "Barcelona" still merge as long as the opponent matches.
+
+    >>> merged = merge([("oasport", [
+    ...     {"time": "18:00", "sport": "VOLLEY", "title": "Mondiali femminili: Italia-Cina", "channels_raw": "Rai 2"},
+    ...     {"time": "18:00", "sport": "BASKET", "title": "Qualificazioni Mondiali: Italia-Islanda",
+    ...      "channels_raw": "Sky Sport Uno"}])])
+    >>> [(e["sport"], e["channels_raw"]) for e in merged]
+    [('VOLLEY', 'Rai 2'), ('BASKET', 'Sky Sport Uno')]
+    >>> merged = merge([("oasport", [{"time": "20:45", "sport": "CALCIO", "title": "LaLiga: Barcellona-Siviglia",
+    ...                               "channels_raw": "DAZN"}]),
+    ...                 ("cdnlive", [{"time": "20:45", "sport": "CALCIO", "title": "LaLiga: Barcelona-Siviglia",
+    ...                               "channels_raw": "DAZN, Movistar"}])])
+    >>> [(e["title"], e["channels_raw"], e["sources"]) for e in merged]
+    [('LaLiga: Barcellona-Siviglia', 'DAZN, Movistar', ['oasport', 'cdnlive'])]
+    """
+    merged = []
+    exact = {}    # (time, sport, both sides or title) -> record
+    by_side = {}  # (time, sport, side) -> records
+    for name, events in sources:
+        own = {}  # the old exact-key dedupe, within this source
+        for ev in events:
+            ev = dict(ev, time=_norm_time(ev.get("time")) or ev.get("time", ""))
+            own_key = f"{ev['time']}_{ev.get('sport')}_{ev['title']}"
+            if own_key in own:
+                _add_channels(own[own_key], ev)
+                continue
+            sport = _norm_name(ev.get("sport") or "")
+            teams = _teams(ev["title"])
+            key = (ev["time"], sport, frozenset(teams) if teams else _norm_name(ev["title"]))
+            # Only records of other sources can be the same event under another wording
+            target = exact.get(key)
+            if target is None or name in target["sources"]:
+                candidates = {id(r): r for t in teams for r in by_side.get((ev["time"], sport, t), [])
+                              if name not in r["sources"]}
+                target = next(iter(candidates.values())) if len(candidates) == 1 else None
+            if target is None:
+                target = dict(ev, sources=[name])
+                merged.append(target)
+                exact.setdefault(key, target)
+                for t in teams:
+                    by_side.setdefault((ev["time"], sport, t), []).append(target)
+            else:
+                if name not in target["sources"]:
+                    target["sources"].append(name)
+                _add_channels(target, ev)
+            own[own_key] = target
+    merged.sort(key=lambda e: e["time"])
+    return merged
+
+
+def get_unified_agenda(resolver):
+    """Today's agenda from every source, fetched in parallel: the slowest one sets the wait"""
+    from resources.lib.parallel import fetch_all
+    from resources.lib.scraper import get_agenda
+
+    def cdnlive_events():
+        sports = resolver.get_sports_events()
+        return [from_cdnlive(ev, sport) for sport in sports.sports()
+                for tourn in sports.tournaments(sport) for ev in sports.matches(sport, tourn)]
+
+    results = fetch_all({"oasport": get_agenda, "cdnlive": cdnlive_events})
+    sources = [(name, results[name]) for name in ("oasport", "cdnlive") if results.get(name)]
+    events = merge(sources)
+    xbmc.log(f"CDNLive Agenda: {len(events)} events from "
+             + ", ".join(f"{name} ({len(evs)})" for name, evs in sources), xbmc.LOGINFO)
+    return events
+
+
+def select_events(events, rules):
+    """
+    The events the agenda lists, by the rules.json "agenda" keywords:
+    - sport: user preferred sports, 'calcio' catches all soccer, then filter by league/exclusion
+    - excluded: explicitly excluded to clean up the agenda
+    - league: strictly soccer leagues requested by the user + major ones
+    When nothing matches, every event not excluded is listed instead.
+    """
+    shown = []
+    # Use a set to prevent showing the exact same event multiple times
+    seen_events = set()
+    for ev in events:
+        event_key = f"{ev['time']}_{ev['sport']}_{ev['title']}"
+        if event_key in seen_events:
+            continue
+
+        # One pass over each string gives every rule category it matches
+        sport_cats = rules.match(ev['sport'])
+        title_cats = rules.match(ev['title'])
+
+        # 1. Check if it's an excluded sport or specifically excluded soccer league
+        if "agenda.excluded" in sport_cats or "agenda.excluded" in title_cats:
+            continue
+
+        # 2. Check if it's a requested sport
+        is_requested_sport = "agenda.sport" in sport_cats
+
+        # 3. Check if it's one of the requested SOCCER leagues (extra safety)
+        is_important_soccer = "agenda.league" in title_cats or "agenda.league" in sport_cats
+
+        # Special case: F1/MotoGP might be in title
+        is_motor_title = "agenda.motor_title" in title_cats
+
+        # Inclusion logic:
+        # - If it's Calcio, it MUST be an important league
+        # - If it's other requested sports, show them
+        if "agenda.soccer" in sport_cats:
+            show_event = is_important_soccer
+        else:
+            show_event = is_requested_sport or is_motor_title
+
+        if show_event:
+            shown.append(ev)
+            seen_events.add(event_key)
+
+    # FALLBACK: If no requested sports found, show all events (but still respect exclusions if possible)
+    if not shown:
+        shown = [ev for ev in events if "agenda.excluded" not in rules.match(ev['sport'])]
+    return shown
+
+
+# --- WIDGETS ---
+# Skins refresh home screen widgets often: they read the last listed agenda
+# from here instead of fetching and filtering the sources again.
+
+def _today():
+    return datetime.date.today().isoformat()
+
+
+def save_widget_agenda(listed):
+    """listed: {event_id: event} as shown by the agenda"""
+    from resources.lib.cache import DiskCache
+    records = [dict(ev, id=event_id) for event_id, ev in listed.items()]
+    DiskCache("widgets").write("agenda", records, date=_today())
+
+
+def _widget_entry():
+    from resources.lib.cache import DiskCache
+    entry = DiskCache("widgets").read("agenda")
+    return entry if entry and entry.get("date") == _today() else None
+
+
+def widget_agenda():
+    """Today's listed events from the disk only ([] when not computed today)"""
+    entry = _widget_entry()
+    return entry.get("data") or [] if entry else []
+
+
+def widget_agenda_outdated():
+    """True until the widget agenda has been computed today"""
+    return _widget_entry() is None
+
+
+def refresh_widget_agenda(resolver):
+    """Build the agenda as list_agenda does (background service), matches included"""
+    from resources.lib.matching import EventMatches
+    from resources.lib.rules import get_rules
+    from resources.lib.store import ObjectStore
+    rules = get_rules()
+    store = ObjectStore("events")
+    listed = {}
+    for ev in select_events(get_unified_agenda(resolver), rules):
+        listed[store.put(ev)] = ev
+    save_widget_agenda(listed)
+    EventMatches().precompute(listed, resolver, rules)
+    return listed
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import time
+
+import xbmc
+
+# Only what local() needs is imported here: every listing with icons goes
+# through it, the download side (requests, PIL) is imported by the service.
+
+MAX_BYTES = 40 * 1024 * 1024   # disk budget of the artwork folder
+MAX_FILE = 1024 * 1024         # larger downloads are not worth keeping
+MAX_SIZE = 256                 # longest side of a stored logo (with PIL)
+PER_ROUND = 60                 # downloads per service round, the rest waits for the next one
+TOUCH_AFTER = 24 * 3600        # a hit refreshes the LRU time at most this often
+EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+CONTENT_TYPES = {"image/png": ".png", "image/jpeg": ".jpg", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+class ArtworkCache:
+    """
+    Channel logos and sport icons stored in the addon profile, so listings
+    hand Kodi local files instead of URLs it fetches one by one while the
+    user scrolls. The service fills it (prefetch); the folder is kept under
+    MAX_BYTES by dropping the least recently used files (mtime, refreshed on hits).
+    """
+
+    def __init__(self):
+        from resources.lib.cache import profile_dir
+        self.path = profile_dir("cache", "art")
+        self._files = None
+        self.failed = set()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+    def _index(self):
+        # One listdir per process: a listing of hundreds of channels must not stat each URL
+        if self._files is None:
+            try:
+                names = os.listdir(self.path)
+            except OSError:
+                names = []
+            self._files = {os.path.splitext(n)[0]: n for n in names if not n.endswith(".tmp")}
+        return self._files
+
+    def local(self, url):
+        """The cached file for url, or url itself while it is not cached"""
+        if not url or not url.startswith(("http://", "https://")):
+            return url
+        name = self._index().get(self._key(url))
+        if name is None:
+            return url
+        path = os.path.join(self.path, name)
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_AFTER:
+                os.utime(path)
+        except OSError:
+            return url
+        return path
+
+    def fetch(self, url):
+        """Download (and downscale) one image; False when it could not be stored"""
+        from urllib.parse import urlsplit
+        from resources.lib import httpclient
+        try:
+            r = httpclient.get(url, timeout=10)
+            if r.status_code != 200 or len(r.content) > MAX_FILE:
+                return False
+            data = r.content
+            ext = os.path.splitext(urlsplit(url).path)[1].lower()
+            if ext not in EXTENSIONS:
+                ext = CONTENT_TYPES.get(r.headers.get("Content-Type", "").split(";")[0].strip(), ".png")
+            data = self._downscale(data)
+        except Exception as e:
+            xbmc.log(f"CB TV Artwork: Failed {url}: {str(e)}", xbmc.LOGDEBUG)
+            return False
+        name = self._key(url) + ext
+        tmp = os.path.join(self.path, name + ".tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.path, name))
+        except OSError:
+            return False
+        self._index()[self._key(url)] = name
+        return True
+
+    @staticmethod
+    def _downscale(data):
+        try:
+            from PIL import Image  # script.module.pil, optional: logos are kept as served without it
+        except ImportError:
+            return data
+        import io
+        img = Image.open(io.BytesIO(data))
+        if max(img.size) <= MAX_SIZE:
+            return data
+        fmt = img.format or "PNG"
+        img.thumbnail((MAX_SIZE, MAX_SIZE))
+        out = io.BytesIO()
+        img.save(out, format=fmt)
+        return out.getvalue()
+
+    def prefetch(self, urls, abort=None):
+        """
+        Download the urls not cached yet, PER_ROUND at most (in parallel),
+        then enforce the disk budget. Returns how many are still missing
+        (0 once the budget is reached).
+        """
+        from functools import partial
+        from resources.lib.parallel import fetch_all
+        index = self._index()
+        missing = []
+        for url in dict.fromkeys(urls):
+            if url and url.startswith(("http://", "https://")) and self._key(url) not in index \
+                    and url not in self.failed:
+                missing.append(url)
+        batch = missing[:PER_ROUND]
+        if batch and not (abort and abort()):
+            results = fetch_all({url: partial(self.fetch, url) for url in batch})
+            self.failed.update(url for url, ok in results.items() if not ok)
+            stored = sum(1 for ok in results.values() if ok)
+            xbmc.log(f"CB TV Artwork: Stored {stored}/{len(batch)} images, {len(missing) - len(batch)} left",
+                     xbmc.LOGDEBUG)
+            if self.evict():
+                # The budget is full: fetching more would only evict what was just stored
+                return 0
+        return len(missing) - len(batch)
+
+    def evict(self, max_bytes=MAX_BYTES):
+        """Delete the least recently used files until the folder fits max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if entry.name.endswith(".tmp") and time.time() - st.st_mtime > 3600:
+                    os.remove(entry.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry))
+                total += st.st_size
+        if total <= max_bytes:
+            return 0
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            if self._files is not None:
+                self._files.pop(os.path.splitext(entry.name)[0], None)
+        xbmc.log(f"CB TV Artwork: Evicted {removed} images (budget {max_bytes // (1024 * 1024)} MB)", xbmc.LOGINFO)
+        return removed
+
+
+def wanted_urls(resolver):
+    """Artwork the listings show, most likely first: sport icons, then channels by viewers"""
+    from resources.lib.schedules import get_schedules
+    store = get_schedules()
+    urls = [store.icon(sport) for sport in store.sports]
+    channels = sorted(resolver.get_catalog().channels, key=lambda ch: -(ch.get("viewers") or 0))
+    urls.extend(ch.get("image") for ch in channels)
+    return [u for u in urls if u]
+
+
+_cache = None
+
+
+def local(url):
+    """Module level ArtworkCache.local for the listings (one index per process)"""
+    global _cache
+    if _cache is None:
+        _cache = ArtworkCache()
+    return _cache.local(url)
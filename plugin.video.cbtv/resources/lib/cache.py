@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import xbmc
+import xbmcaddon
+import xbmcvfs
+from resources.lib import metrics
+
+ADDON_ID = 'plugin.video.cbtv'
+
+_profile = None
+
+# Loader result meaning "the upstream says our copy is still current" (HTTP 304)
+NOT_MODIFIED = object()
+
+
+class Validated:
+    """Loader result carrying the HTTP validators (ETag, Last-Modified) of the data"""
+
+    def __init__(self, data, validators):
+        self.data = data
+        self.validators = validators
+
+
+def profile_dir(*parts):
+    """Return a directory inside the addon profile, creating it if needed."""
+    global _profile
+    if _profile is None:
+        _profile = xbmcvfs.translatePath(xbmcaddon.Addon(ADDON_ID).getAddonInfo('profile'))
+    path = os.path.join(_profile, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def append_jsonl(name, record, keep, trim_bytes):
+    """
+    Append record to the stats/name JSON-lines log. Once the file outgrows
+    trim_bytes it is cut back to its last keep lines (swapped in atomically).
+    Raises OSError: the callers log it their own way.
+    """
+    path = os.path.join(profile_dir("stats"), name)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    if os.path.getsize(path) > trim_bytes:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()[-keep:]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, path)
+
+
+class DiskCache:
+    """
+    JSON snapshots of upstream responses kept in the addon profile.
+    Kodi starts a new interpreter for every folder, so anything kept in memory
+    is lost between screens: the disk is the only place a cache can live.
+    """
+
+    # A refresh lock older than this is assumed to belong to a dead process
+    LOCK_TIMEOUT = 60
+
+    def __init__(self, namespace="api"):
+        self.path = profile_dir("cache", namespace)
+
+    def _file(self, key):
+        safe = re.sub(r'[^a-z0-9_.-]', '_', key.lower())
+        return os.path.join(self.path, safe + ".json")
+
+    def read(self, key):
+        """Return the stored entry ({"ts", "data", "version", "validators"}) or None."""
+        try:
+            with open(self._file(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+                # The file time is the entry time: a 304 refreshes it without a rewrite
+                entry["ts"] = os.fstat(f.fileno()).st_mtime
+                return entry
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, data, **meta):
+        # Serialize once: the same bytes give the content version and the file body
+        body = json.dumps(data, separators=(",", ":"))
+        version = hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+        entry = dict(meta, version=version)
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":"))[:-1] + ',"data":' + body + "}")
+            # Atomic swap: a concurrent reader never sees a half-written file
+            os.replace(tmp, path)
+            # Sidecar so the version can be checked without parsing the data
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(version)
+            os.replace(tmp, path + ".ver")
+        except OSError as e:
+            xbmc.log(f"CDNLive Cache: Write error for {key}: {str(e)}", xbmc.LOGERROR)
+        entry["data"] = data
+        entry["ts"] = time.time()
+        return entry
+
+    def version(self, key):
+        """Content version of the stored data (changes only when the data does)"""
+        try:
+            with open(self._file(key) + ".ver", "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def touch(self, key, entry):
+        """Mark entry as fresh again without rewriting it"""
+        try:
+            os.utime(self._file(key))
+        except OSError:
+            return None
+        entry["ts"] = time.time()
+        return entry
+
+    def age(self, entry):
+        return time.time() - entry.get("ts", 0) if entry else None
+
+    def age_of(self, key):
+        """Age of the stored entry from its file time, without reading it (None if missing)"""
+        try:
+            return time.time() - os.path.getmtime(self._file(key))
+        except OSError:
+            return None
+
+    def prune(self, keep):
+        """Delete every entry of the namespace but the keys in keep (past days' snapshots)"""
+        keep = {os.path.basename(self._file(key)) for key in keep}
+        removed = 0
+        for name in os.listdir(self.path):
+            # The entry with its .ver sidecar, lock and temporary files
+            if ".json" not in name or name[:name.index(".json") + 5] in keep:
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _lock(self, key):
+        lock = self._file(key) + ".lock"
+        try:
+            if time.time() - os.path.getmtime(lock) > self.LOCK_TIMEOUT:
+                os.remove(lock)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL))
+            return lock
+        except OSError:
+            return None
+
+    def _refresh(self, key, loader, lock=None):
+        """
+        loader(validators) gets the stored validators (or {}) and returns the new
+        data, a Validated wrapper, NOT_MODIFIED, or None on failure.
+        """
+        try:
+            entry = self.read(key)
+            validators = entry.get("validators") or {} if entry else {}
+            result = loader(validators)
+            if result is NOT_MODIFIED:
+                if entry is None:
+                    return None
+                xbmc.log(f"CDNLive Cache: {key} not modified upstream", xbmc.LOGDEBUG)
+                return self.touch(key, entry)
+            if isinstance(result, Validated):
+                return self.write(key, result.data, validators=result.validators)
+            if result is not None:
+                return self.write(key, result)
+            return None
+        finally:
+            if lock:
+                try:
+                    os.remove(lock)
+                except OSError:
+                    pass
+
+    def warm(self, key, loader, ttl, margin=0):
+        """
+        Refresh key if it will go stale within margin seconds (used by the
+        background service so that plugin invocations always find fresh data).
+        Returns True only when the refresh changed the stored data.
+        """
+        age = self.age(self.read(key))
+        if age is not None and age < ttl - margin:
+            return False
+        lock = self._lock(key)
+        if not lock:
+            return False
+        before = self.version(key)
+        fresh = self._refresh(key, loader, lock)
+        # A 304 (or an identical body) keeps the version: nothing downstream to redo
+        return fresh is not None and fresh.get("version") != before
+
+    def fetch(self, key, loader, ttl, stale_ttl=0):
+        """Data of fetch_entry(), see there"""
+        entry = self.fetch_entry(key, loader, ttl, stale_ttl)
+        return entry["data"] if entry is not None else None
+
+    def fetch_entry(self, key, loader, ttl, stale_ttl=0):
+        """
+        Return the entry for key, calling loader(validators) only when it is needed.
+        - younger than ttl: served from disk
+        - younger than ttl + stale_ttl: served from disk, refreshed in background
+        - older or missing: loader is called; if it fails (returns None)
+          the last good snapshot is served regardless of its age
+        """
+        entry = self.read(key)
+        age = self.age(entry)
+
+        if entry is not None and age < ttl:
+            metrics.record_cache(key, "hit")
+            return entry
+
+        if entry is not None and age < ttl + stale_ttl:
+            metrics.record_cache(key, "stale")
+            lock = self._lock(key)
+            if lock:
+                xbmc.log(f"CDNLive Cache: Serving stale {key} ({int(age)}s), refreshing", xbmc.LOGINFO)
+                # Non-daemon: the interpreter waits for it after the listing is sent
+                threading.Thread(target=self._refresh, args=(key, loader, lock)).start()
+            return entry
+
+        fresh = self._refresh(key, loader)
+        if fresh is not None:
+            metrics.record_cache(key, "miss")
+            return fresh
+        if entry is not None:
+            metrics.record_cache(key, "fallback")
+            xbmc.log(f"CDNLive Cache: Upstream failed, using last snapshot of {key} ({int(age)}s old)", xbmc.LOGWARNING)
+            return entry
+        return None
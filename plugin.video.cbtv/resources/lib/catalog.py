@@ -0,0 +1,205 @@
+import os
+import pickle
+import re
+
+import xbmc
+
+# Bump when the normalized record layout changes: older snapshots are normalized again
+CATALOG_FORMAT = 1
+
+# Map code (e.g., 'it', 'en', 'es') to country name
+COUNTRY_NAMES = {
+    "it": "Italy", "es": "Spain", "en": "UK / International", "us": "USA",
+    "fr": "France", "de": "Germany", "pt": "Portugal", "dk": "Denmark",
+    "tr": "Turkey", "ro": "Romania", "pl": "Poland", "ar": "Arabic"
+}
+
+QUALITY_TAGS = ("4k", "uhd", "fhd", "hd", "sd")
+
+NUMBER_RE = re.compile(r'(?<!\d)(\d{1,4})(?!\d)')
+# Numbered sub-channels ("Sky Sport 3", "beIN 4", "sport5"...): the anti-spam filter
+# of the agenda. Same strings as " 3".." 250" anywhere in the name, " 3".." 9" as a
+# word, or a letter directly followed by 3-9 as a word.
+SUB_CHANNEL_RE = re.compile(r' (?:[3-9]|[12]\d)|\s[3-9]\b|[a-z][3-9]\b')
+
+
+def normalize_channel(ch):
+    """
+    Channel record with the fields the filters need, computed once per snapshot:
+    lname, brand (name without number/quality), number, quality, country,
+    key (dedupe id) and the sub_channel flag. API fields are kept as they are.
+    """
+    name = ch.get("name") or ""
+    lname = name.lower()
+    code = (ch.get("code") or "ot").lower()
+
+    tokens = lname.split()
+    quality = next((t for t in tokens if t in QUALITY_TAGS), "")
+    while tokens and (tokens[-1].isdigit() or tokens[-1] in QUALITY_TAGS):
+        tokens.pop()
+    numbers = NUMBER_RE.findall(lname)
+
+    rec = dict(ch)
+    rec.update({
+        "lname": lname,
+        "brand": " ".join(tokens),
+        "number": int(numbers[-1]) if numbers else None,
+        "quality": quality,
+        "country": COUNTRY_NAMES.get(code, "Other"),
+        "key": f"{ch.get('code')}_{name}".lower(),
+        "sub_channel": bool(SUB_CHANNEL_RE.search(lname)),
+    })
+    return rec
+
+
+def normalize_catalog(data):
+    """Normalize the channels payload in place (no-op if already done)"""
+    if not data or data.get("format") == CATALOG_FORMAT:
+        return data
+    data["channels"] = [normalize_channel(ch) for ch in data.get("channels", [])]
+    data["format"] = CATALOG_FORMAT
+    return data
+
+
+class Snapshot:
+    """
+    Data derived from a cached API response, pickled in the addon profile.
+    It is tied to the content version of the response (and to an optional
+    signature of other inputs) and rebuilt only when one of them changes, so
+    a plugin invocation loads it instead of parsing and regrouping the JSON.
+    """
+
+    # Bump when the snapshot layout changes: older files are rebuilt
+    FORMAT = 1
+    FILE = None
+
+    def __init__(self, source_version, sig=None):
+        self.source_version = source_version
+        self.sig = sig
+
+    @classmethod
+    def _path(cls):
+        from resources.lib.cache import profile_dir
+        return os.path.join(profile_dir("cache", "catalog"), cls.FILE)
+
+    @classmethod
+    def load(cls, source_version, sig=None):
+        """Stored snapshot for this source version and signature, or None"""
+        if not source_version:
+            return None
+        try:
+            with open(cls._path(), "rb") as f:
+                header = pickle.load(f)
+                if header != (cls.FORMAT, source_version, sig):
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # Missing, truncated or from an older layout: it is rebuilt
+            return None
+
+    def save(self):
+        if not self.source_version:
+            return
+        path = self._path()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                # Small header first: load() rejects a stale snapshot without unpickling it
+                pickle.dump((self.FORMAT, self.source_version, self.sig), f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            xbmc.log(f"CDNLive: {type(self).__name__} write error: {str(e)}", xbmc.LOGERROR)
+
+
+class IndexSnapshot(Snapshot):
+    """The ChannelIndex of a CatalogSnapshot, stored apart from it (same version and sig)"""
+
+    FILE = "index.pkl"
+
+    def __init__(self, index, source_version, sig=None):
+        super().__init__(source_version, sig)
+        self.index = index
+
+
+class CatalogSnapshot(Snapshot):
+    """
+    The processed channel catalog: online channel records plus the
+    by-country, by-sport and name indexes built from them. Besides the
+    "channels" response it depends on the rule files (sig). The name index
+    lives in its own file (IndexSnapshot), loaded on first use: listings
+    that only group channels never read it.
+    """
+
+    FORMAT = 2
+    FILE = "catalog.pkl"
+
+    def __init__(self, channels, source_version, rules_sig):
+        from resources.lib.channel_index import ChannelIndex
+        super().__init__(source_version, rules_sig)
+        self.channels = channels
+        self._index = ChannelIndex(channels)
+
+        self.by_country = {}
+        for ch in channels:
+            self.by_country.setdefault(ch["country"], []).append(ch)
+
+        # Channel keywords per sport: rules.json, "sport_channels"
+        from resources.lib.rules import get_rules
+        rules = get_rules()
+        self.by_sport = {}
+        for sport in rules.table.get("sport_channels", {}):
+            found, seen = [], set()
+            for ch in self.index.match_any(rules.keywords(f"sport_channels.{sport}")):
+                if ch["key"] not in seen:
+                    found.append(ch)
+                    seen.add(ch["key"])
+            self.by_sport[sport] = sorted(found, key=lambda x: x.get("name"))
+
+    def __getstate__(self):
+        return dict(self.__dict__, _index=None)
+
+    @property
+    def index(self):
+        """ChannelIndex of the channels (stored one, or rebuilt when it is missing)"""
+        if self._index is None:
+            from resources.lib.channel_index import ChannelIndex
+            stored = IndexSnapshot.load(self.source_version, self.sig)
+            self._index = stored.index.bind(self.channels) if stored else ChannelIndex(self.channels)
+        return self._index
+
+    def save(self):
+        super().save()
+        IndexSnapshot(self.index, self.source_version, self.sig).save()
+
+
+class SportsEvents(Snapshot):
+    """
+    The "events/sports" payload indexed by sport and tournament: listing the
+    tournaments of a sport and the matches of a tournament are dict lookups.
+    Sport names are matched case-insensitively (the API says "Soccer").
+    """
+
+    FILE = "sports.pkl"
+
+    def __init__(self, categories, source_version):
+        super().__init__(source_version)
+        self.names = {}
+        self.by_sport = {}
+        for sport, events in (categories or {}).items():
+            if not isinstance(events, list):
+                continue
+            self.names.setdefault(sport.lower(), sport)
+            tournaments = self.by_sport.setdefault(sport.lower(), {})
+            for ev in events:
+                tournaments.setdefault(ev.get("tournament", "Other"), []).append(ev)
+
+    def sports(self):
+        """Sport names as the API spells them"""
+        return sorted(self.names.values())
+
+    def tournaments(self, sport):
+        return sorted(self.by_sport.get(sport.lower(), {}))
+
+    def matches(self, sport, tournament):
+        return self.by_sport.get(sport.lower(), {}).get(tournament, [])
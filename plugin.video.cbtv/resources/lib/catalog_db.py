@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+
+import xbmc
+from resources.lib.cache import profile_dir
+
+SCHEMA_VERSION = 1
+DB_FILE = "catalog.db"
+
+# Trigram tokens: a phrase query is a case-insensitive substring match, like the
+# `kw in name` scans it replaces, but only for terms of 3 characters or more
+FTS_MIN_TERM = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY, key TEXT, name TEXT, code TEXT, country TEXT, url TEXT, image TEXT
+);
+CREATE INDEX IF NOT EXISTS channels_country ON channels (country);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY, sport TEXT, tournament TEXT, title TEXT, time TEXT, data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_tournament ON events (sport, tournament);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS channels_fts
+    USING fts5(name, content='channels', content_rowid='id', tokenize='trigram');
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts
+    USING fts5(title, tournament, content='events', content_rowid='id', tokenize='trigram');
+"""
+
+
+def _event_title(ev):
+    return f"{ev.get('homeTeam')} vs {ev.get('awayTeam')}"
+
+
+class CatalogDB:
+    """
+    SQLite copy of the channel catalog and of the events/sports data, with
+    FTS5 trigram indexes on channel names and event titles. Each table is
+    reloaded only when the content version of its source snapshot changes.
+    Without FTS5 (or the trigram tokenizer, SQLite < 3.34) queries fall
+    back to LIKE scans, still inside SQLite.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(profile_dir(), DB_FILE)
+        self.conn = self._open()
+        self.fts = self._meta("fts") == "1"
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        except sqlite3.DatabaseError:
+            version = None
+        if version not in (0, SCHEMA_VERSION):
+            # Only derived data lives here: an old layout or a damaged file is simply dropped
+            conn.close()
+            os.remove(self.path)
+            conn = sqlite3.connect(self.path, timeout=10)
+        # WAL: the plugin can read while the service rewrites a table
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        fts = "1"
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            xbmc.log(f"CDNLive DB: FTS5 trigram unavailable ({str(e)}), using LIKE", xbmc.LOGWARNING)
+            fts = "0"
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('fts', ?)", (fts,))
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.commit()
+        return conn
+
+    def close(self):
+        self.conn.close()
+
+    def _meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _reload(self, table, version, rows):
+        """Replace table (and its FTS index) with rows, tagged with the source version"""
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {table}")
+            if rows:
+                placeholders = ",".join("?" * len(rows[0]))
+                self.conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+            if self.fts:
+                self.conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f"{table}_version", version))
+        xbmc.log(f"CDNLive DB: Loaded {len(rows)} {table} (version {version})", xbmc.LOGINFO)
+
+    def sync(self, resolver):
+        """
+        Bring both tables up to the resolver's current snapshots. The stored
+        versions are compared first: a table already in step costs no load.
+        """
+        version = resolver.get_snapshot_version("channels")
+        if not version or self._meta("channels_version") != version:
+            catalog = resolver.get_catalog()
+            if catalog.source_version and self._meta("channels_version") != catalog.source_version:
+                self._reload("channels", catalog.source_version, [
+                    (i, ch["key"], ch.get("name"), ch.get("code"), ch["country"], ch.get("url"), ch.get("image"))
+                    for i, ch in enumerate(catalog.channels)
+                ])
+
+        version = resolver.get_snapshot_version("events/sports")
+        if version and self._meta("events_version") == version:
+            return
+        sports = resolver.get_sports_categories()
+        version = resolver.get_snapshot_version("events/sports")
+        if sports and version and self._meta("events_version") != version:
+            rows = []
+            for sport, events in sports.items():
+                if not isinstance(events, list):
+                    continue
+                for ev in events:
+                    rows.append((len(rows), sport, ev.get("tournament", "Other"), _event_title(ev),
+                                 ev.get("time"), json.dumps(ev, separators=(",", ":"))))
+            self._reload("events", version, rows)
+
+    def _where(self, table, columns, query):
+        """
+        WHERE clause matching every word of query in any of columns: words long
+        enough for the trigram index go through FTS, shorter ones through LIKE.
+        A query without words matches nothing.
+        """
+        words = query.lower().split()
+        long_words = [w for w in words if len(w) >= FTS_MIN_TERM] if self.fts else []
+        clauses, args = [], []
+        if long_words:
+            clauses.append(f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)")
+            args.append(" AND ".join('"' + w.replace('"', '""') + '"' for w in long_words))
+        for w in words:
+            if w in long_words:
+                continue
+            like = "%" + w.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(" + " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns) + ")")
+            args.extend([like] * len(columns))
+        return " AND ".join(clauses) or "0", args
+
+    def search_channels(self, query, limit=100):
+        """Channels whose name contains every word of query, by name"""
+        where, args = self._where("channels", ("name",), query)
+        rows = self.conn.execute(
+            f"SELECT name, code, url, image FROM channels WHERE {where} ORDER BY name LIMIT ?",
+            args + [limit])
+        return [dict(zip(("name", "code", "url", "image"), r)) for r in rows]
+
+    def search_events(self, query, limit=50):
+        """events/sports events whose title or tournament contains every word of query"""
+        where, args = self._where("events", ("title", "tournament"), query)
+        rows = self.conn.execute(
+            f"SELECT data FROM events WHERE {where} ORDER BY time, title LIMIT ?", args + [limit])
+        return [json.loads(r[0]) for r in rows]
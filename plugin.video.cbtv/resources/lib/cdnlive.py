@@ -1,16 +1,37 @@
-import requests
 import re
 import json
 import xbmc
-from urllib.parse import unquote, quote_plus
+from urllib.parse import unquote, quote_plus, urlparse
+from resources.lib.cache import DiskCache, NOT_MODIFIED, Validated
+from resources.lib.catalog import CatalogSnapshot, SportsEvents, normalize_catalog
+from resources.lib.channel_index import ChannelIndex
 
 class CDNLiveResolver:
+    # Per-endpoint cache policy in seconds: (fresh for, then served stale while refreshing for)
+    API_TTL = {
+        "channels": (300, 3600),
+        "events/sports": (120, 900),
+    }
+    DEFAULT_TTL = (120, 600)
+
     def __init__(self, user="streamsports99", plan="vip"):
         self.user = user
         self.plan = plan
         self.base_api = "https://api.cdn-live.tv/api/v1"
         self.player_referer = "https://streamsports99.su/"
         self.ua = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        self._cache = None
+        self._index = None
+        self._catalog = None
+        self._sports = None
+        # Content version of each endpoint snapshot served by fetch_api
+        self.versions = {}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            self._cache = DiskCache("api")
+        return self._cache
 
     def get_headers(self, referer=None):
         return {
@@ -19,51 +40,156 @@ class CDNLiveResolver:
             "Origin": "https://cdn-live.tv"
         }
 
-    def fetch_api(self, endpoint):
+    def fetch_api(self, endpoint, use_cache=True):
+        """API call backed by the on-disk cache shared across plugin invocations"""
+        if not use_cache:
+            result = self._fetch_api_remote(endpoint, {})
+            return result.data if result else None
+        ttl, stale_ttl = self.API_TTL.get(endpoint, self.DEFAULT_TTL)
+        entry = self.cache.fetch_entry(endpoint, lambda v: self._fetch_api_remote(endpoint, v), ttl, stale_ttl)
+        if entry is None:
+            return None
+        self.versions[endpoint] = entry.get("version")
+        return entry["data"]
+
+    def get_snapshot_version(self, endpoint="channels"):
+        """Version of the endpoint snapshot, without loading it if this process has not yet"""
+        return self.versions.get(endpoint) or self.cache.version(endpoint)
+
+    def warm_api(self, endpoint, margin=0):
+        """Refresh the cached endpoint ahead of expiry (background service)"""
+        ttl, _ = self.API_TTL.get(endpoint, self.DEFAULT_TTL)
+        refreshed = self.cache.warm(endpoint, lambda v: self._fetch_api_remote(endpoint, v), ttl, margin)
+        # Rebuild the derived snapshot here too, not in the next plugin invocation
+        if refreshed and endpoint == "channels":
+            self._catalog = None
+            self.get_catalog()
+        elif refreshed and endpoint == "events/sports":
+            self._sports = None
+            self.get_sports_events()
+        return refreshed
+
+    def _fetch_api_remote(self, endpoint, validators):
+        """Conditional API call: Validated(data, validators), NOT_MODIFIED or None on error"""
         url = f"{self.base_api}/{endpoint}/?user={self.user}&plan={self.plan}"
+        from resources.lib import health
+        if health.is_open(urlparse(self.base_api).hostname):
+            # Upstream down: fail at once so the cached snapshot is served
+            xbmc.log(f"CDNLive: API circuit open, skipping {endpoint}", xbmc.LOGINFO)
+            return None
         xbmc.log(f"CDNLive: Fetching API: {url}", xbmc.LOGINFO)
         try:
-            r = requests.get(url, headers=self.get_headers(), timeout=15, verify=False)
-            xbmc.log(f"CDNLive: API Status: {r.status_code}", xbmc.LOGINFO)
+            from resources.lib import httpclient
+            r = httpclient.conditional_get(url, validators, headers=self.get_headers(), verify=False)
+            xbmc.log(f"CDNLive: API Status: {r.status_code} ({int(r.elapsed.total_seconds() * 1000)}ms)", xbmc.LOGINFO)
+            if r.status_code == 304:
+                return NOT_MODIFIED
             r.raise_for_status()
             data = r.json()
-            return data
+            if endpoint == "channels":
+                # Normalized once here, the cached snapshot holds the final records
+                normalize_catalog(data)
+            return Validated(data, httpclient.validators_of(r))
         except Exception as e:
             xbmc.log(f"CDNLive: API Error: {str(e)}", xbmc.LOGERROR)
             return None
 
+    def _snapshot(self, cls, endpoint, build, sig=None):
+        """
+        Snapshot of type cls derived from the endpoint response. While the
+        cached response is fresh the stored snapshot is loaded as is; the
+        JSON is parsed and build(data, version) called only when its version
+        (or sig) changes.
+        """
+        ttl, _ = self.API_TTL.get(endpoint, self.DEFAULT_TTL)
+        age = self.cache.age_of(endpoint)
+        if age is not None and age < ttl:
+            snapshot = cls.load(self.cache.version(endpoint), sig)
+            if snapshot is not None:
+                return snapshot
+
+        data = self.fetch_api(endpoint)
+        version = self.versions.get(endpoint)
+        # Stale or fallback response: still the version the stored snapshot was built from
+        snapshot = cls.load(version, sig)
+        if snapshot is None:
+            snapshot = build(data, version)
+            snapshot.save()
+            xbmc.log(f"CDNLive: {cls.__name__} rebuilt for version {version}", xbmc.LOGINFO)
+        return snapshot
+
+    def get_catalog(self):
+        """Processed channel catalog (catalog.CatalogSnapshot)"""
+        if self._catalog is None:
+            from resources.lib.rules import signature
+            rules_sig = signature()
+
+            def build(data, version):
+                # normalize_catalog is a no-op unless the snapshot predates the record format
+                data = normalize_catalog(data)
+                channels = data.get("channels", []) if data else []
+                xbmc.log(f"CDNLive: Total channels from API: {len(channels)}", xbmc.LOGINFO)
+                return CatalogSnapshot(self._filter_online(channels), version, rules_sig)
+
+            self._catalog = self._snapshot(CatalogSnapshot, "channels", build, rules_sig)
+        return self._catalog
+
+    def get_sports_events(self):
+        """events/sports indexed by sport and tournament (catalog.SportsEvents)"""
+        if self._sports is None:
+            self._sports = self._snapshot(
+                SportsEvents, "events/sports",
+                lambda data, version: SportsEvents((data or {}).get("cdn-live-tv"), version))
+        return self._sports
+
     def get_channels(self):
-        data = self.fetch_api("channels")
-        channels = data.get("channels", []) if data else []
-        xbmc.log(f"CDNLive: Total channels from API: {len(channels)}", xbmc.LOGINFO)
-        
+        return self.get_catalog().channels
+
+    def get_sport_channels(self, sport):
+        """Channels of a sport (rules.json, "sport_channels"), deduplicated and sorted by name"""
+        return self.get_catalog().by_sport.get(sport, [])
+
+    def get_cached_catalog(self):
+        """The stored catalog snapshot as is, never fetching or rebuilding (None if there is none)"""
+        from resources.lib.rules import signature
+        return CatalogSnapshot.load(self.cache.version("channels"), signature())
+
+    def get_cached_channel_count(self):
+        """Online channel count from the on-disk cache only (None if nothing is cached yet)"""
+        catalog = self.get_cached_catalog()
+        if catalog is not None:
+            return len(catalog.channels)
+        entry = self.cache.read("channels")
+        if not entry or not entry.get("data"):
+            return None
+        return len(self._filter_online(entry["data"].get("channels", []), quiet=True))
+
+    @staticmethod
+    def _filter_online(channels, quiet=False):
         # Filter for online channels only
         online = [ch for ch in channels if ch.get("status") == "online"]
-        xbmc.log(f"CDNLive: Online channels filter: {len(online)}", xbmc.LOGINFO)
+        if not quiet:
+            xbmc.log(f"CDNLive: Online channels filter: {len(online)}", xbmc.LOGINFO)
         
         # FALLBACK: If filtering for 'online' results in 0, return all channels
         # This prevents an empty menu if the API status field is temporarily unreliable
         if channels and not online:
-            xbmc.log("CDNLive: WARNING: Online filter returned 0, falling back to all channels", xbmc.LOGWARNING)
+            if not quiet:
+                xbmc.log("CDNLive: WARNING: Online filter returned 0, falling back to all channels", xbmc.LOGWARNING)
             return channels
             
         return online
 
+    def get_channel_index(self, channels=None):
+        """Name index over the channel list, built once per catalog snapshot"""
+        if channels is None or channels is self.get_catalog().channels:
+            return self.get_catalog().index
+        if self._index is None or self._index.channels is not channels:
+            self._index = ChannelIndex(channels)
+        return self._index
+
     def get_channels_grouped(self):
-        channels = self.get_channels()
-        grouped = {}
-        for ch in channels:
-            # Map code (e.g., 'it', 'en', 'es') to country name
-            country_code = ch.get("code", "ot").lower()
-            country_map = {
-                "it": "Italy", "es": "Spain", "en": "UK / International", "us": "USA",
-                "fr": "France", "de": "Germany", "pt": "Portugal", "dk": "Denmark",
-                "tr": "Turkey", "ro": "Romania", "pl": "Poland", "ar": "Arabic"
-            }
-            country_name = country_map.get(country_code, "Other")
-            if country_name not in grouped: grouped[country_name] = []
-            grouped[country_name].append(ch)
-        return grouped
+        return self.get_catalog().by_country
 
     def get_sports_categories(self):
         data = self.fetch_api("events/sports")
@@ -120,7 +246,8 @@ class CDNLiveResolver:
              url_with_plan = url_with_plan.replace(f"plan={self.plan}", f"plan={current_plan}")
 
         try:
-            r = requests.get(url_with_plan, headers=self.get_headers(), timeout=15, verify=False)
+            from resources.lib import httpclient
+            r = httpclient.get(url_with_plan, headers=self.get_headers(), verify=False)
             r.raise_for_status()
             
             js = self.decode_js(r.text)
@@ -0,0 +1,123 @@
+import re
+from array import array
+
+TOKEN_RE = re.compile(r'[a-z0-9+]+')
+
+
+class ChannelIndex:
+    """
+    Inverted index over channel names, built once per catalog snapshot.
+    Lookups give the same answer as `kw in name.lower()` but only verify the
+    channels sharing the keyword's n-grams instead of scanning the whole list.
+    Pickled, the postings become spans of one flat array of channel ids, so
+    the stored index loads as a few buffers instead of one object per entry;
+    each posting turns back into a set the first time a lookup needs it.
+    """
+
+    NGRAM_SIZES = (2, 3)
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.names = [ch.get("lname") or ch.get("name", "").lower() for ch in channels]
+        self.tokens = {}
+        self.grams = {}
+        self._memo = {}
+
+        for i, name in enumerate(self.names):
+            for tok in TOKEN_RE.findall(name):
+                self.tokens.setdefault(tok, set()).add(i)
+            for n in self.NGRAM_SIZES:
+                for j in range(len(name) - n + 1):
+                    self.grams.setdefault(name[j:j + n], set()).add(i)
+
+    def __getstate__(self):
+        # Stored without the channel records (the catalog snapshot has them): see bind()
+        state = dict(self.__dict__, channels=None, _memo={})
+        ids = array("I")
+        for table in ("tokens", "grams"):
+            spans = {}
+            for key, posting in state[table].items():
+                if isinstance(posting, tuple):
+                    # Loaded from a snapshot and never looked up: still packed
+                    posting = self._ids[posting[0]:posting[1]]
+                start = len(ids)
+                ids.extend(sorted(posting))
+                spans[key] = (start, len(ids))
+            state[table] = spans
+        state["_ids"] = ids
+        return state
+
+    def _posting(self, table, key):
+        posting = table.get(key)
+        if isinstance(posting, tuple):
+            posting = table[key] = set(self._ids[posting[0]:posting[1]])
+        return posting
+
+    def bind(self, channels):
+        """Attach the channel records of the catalog the index was built from"""
+        self.channels = channels
+        return self
+
+    def __len__(self):
+        return len(self.channels)
+
+    def find(self, kw):
+        """Ids of the channels whose name contains kw (case insensitive)"""
+        kw = kw.lower()
+        if kw in self._memo:
+            return self._memo[kw]
+
+        n = min(len(kw), self.NGRAM_SIZES[-1])
+        if n < self.NGRAM_SIZES[0]:
+            ids = {i for i, name in enumerate(self.names) if kw in name}
+        else:
+            postings = []
+            for j in range(len(kw) - n + 1):
+                ids = self._posting(self.grams, kw[j:j + n])
+                if not ids:
+                    postings = None
+                    break
+                postings.append(ids)
+            if postings is None:
+                ids = set()
+            else:
+                postings.sort(key=len)
+                candidates = set(postings[0])
+                for p in postings[1:]:
+                    candidates &= p
+                    if not candidates:
+                        break
+                # n-grams are a necessary condition only: confirm the real substring
+                ids = {i for i in candidates if kw in self.names[i]} if len(kw) > n else candidates
+
+        ids = frozenset(ids)
+        self._memo[kw] = ids
+        return ids
+
+    def find_any(self, keywords):
+        """Ids of the channels whose name contains at least one keyword"""
+        found = set()
+        for kw in keywords:
+            found |= self.find(kw)
+        return found
+
+    def find_words(self, words):
+        """Ids of the channels containing every word as a whole token"""
+        result = None
+        for w in words:
+            ids = self._posting(self.tokens, w.lower()) or set()
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def get(self, ids):
+        """Channels for the given ids, in catalog order"""
+        return [self.channels[i] for i in sorted(ids)]
+
+    def match_any(self, keywords, exclude=None):
+        """Channels matching any keyword and none of the exclude keywords"""
+        ids = self.find_any(keywords)
+        if exclude and ids:
+            ids = ids - self.find_any(exclude)
+        return self.get(ids)
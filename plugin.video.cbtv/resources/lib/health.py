@@ -0,0 +1,125 @@
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import xbmc
+
+# Upstream health, shared by every plugin invocation and the service through
+# the addon profile (one small file per host, re-read on every check and
+# rewritten on every outcome, so no process works from an old copy).
+# Timeouts follow the recent latency of each host and a host that keeps failing
+# is skipped for a while (circuit open): callers fall back to their cached data
+# at once instead of waiting for yet another timeout.
+HEALTH_DIR = "health"
+FAILURE_THRESHOLD = 3    # consecutive failed attempts that open the circuit
+OPEN_SECONDS = 60        # then one trial request is let through (half open)
+LATENCY_SAMPLES = 20     # recent successful latencies kept per host
+MIN_SAMPLES = 5          # below this the caller's timeout is used as is
+TIMEOUT_FACTOR = 4       # adaptive timeout = p95 latency * factor...
+MIN_TIMEOUT = 3.0        # ...but never below this (seconds)
+
+HOST_RE = re.compile(r'[^a-z0-9_.-]')
+
+_lock = threading.Lock()
+
+
+def _path(host):
+    from resources.lib.cache import profile_dir
+    return os.path.join(profile_dir("stats", HEALTH_DIR), HOST_RE.sub("_", (host or "").lower()) + ".json")
+
+
+def _read(host):
+    try:
+        with open(_path(host), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(host, h):
+    path = _path(host)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(h, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError as e:
+        xbmc.log(f"CB TV Health: Write error: {str(e)}", xbmc.LOGWARNING)
+
+
+def is_open(host):
+    """True while host is skipped: lets callers avoid even importing the HTTP stack"""
+    h = _read(host)
+    return bool(h and h.get("opened")) and time.time() - h["opened"] < OPEN_SECONDS
+
+
+def allow(host):
+    """False while the circuit of host is open; past OPEN_SECONDS one trial is let through"""
+    with _lock:
+        h = _read(host)
+        if not h or not h.get("opened"):
+            return True
+        if time.time() - h["opened"] < OPEN_SECONDS:
+            return False
+        # Half open: restart the window so concurrent callers keep skipping the host
+        h["opened"] = time.time()
+        _write(host, h)
+        return True
+
+
+def timeout_for(host, timeout):
+    """Caller's timeout, shrunk to a multiple of the host's recent p95 latency"""
+    samples = sorted((_read(host) or {}).get("latency", []))
+    if len(samples) < MIN_SAMPLES or not isinstance(timeout, (int, float)):
+        return timeout
+    p95 = samples[max(0, math.ceil(0.95 * len(samples)) - 1)]
+    return min(timeout, max(MIN_TIMEOUT, p95 * TIMEOUT_FACTOR))
+
+
+def record(host, elapsed, ok, failures=1):
+    """
+    Outcome of a request to host: ok is False for network errors and 5xx
+    statuses, failures the number of failed attempts behind it (retries included)
+    """
+    with _lock:
+        h = _read(host) or {"failures": 0, "opened": None, "latency": []}
+        if ok:
+            h["failures"] = 0
+            h["opened"] = None
+            h["latency"] = (h.get("latency", []) + [round(elapsed, 3)])[-LATENCY_SAMPLES:]
+        else:
+            h["failures"] = h.get("failures", 0) + failures
+            if h["failures"] >= FAILURE_THRESHOLD:
+                if not h.get("opened"):
+                    xbmc.log(f"CB TV Health: Circuit open for {host} after {h['failures']} failures, "
+                             f"serving cached data for {OPEN_SECONDS}s", xbmc.LOGWARNING)
+                h["opened"] = time.time()
+        h["host"] = host
+        _write(host, h)
+
+
+def status():
+    """{host: {"failures", "open", "timeout"}} for the diagnostics screen"""
+    from resources.lib.cache import profile_dir
+    from resources.lib.httpclient import DEFAULT_TIMEOUT
+    hosts = {}
+    for path in glob.glob(os.path.join(profile_dir("stats", HEALTH_DIR), "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                h = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if h.get("host"):
+            hosts[h["host"]] = h
+    return {
+        host: {
+            "failures": h.get("failures", 0),
+            "open": is_open(host),
+            "timeout": timeout_for(host, DEFAULT_TIMEOUT),
+        }
+        for host, h in hosts.items()
+    }
@@ -0,0 +1,134 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from resources.lib import health, metrics
+
+# Central network policy: every outbound request of the addon goes through here
+DEFAULT_TIMEOUT = 15
+POOL_HOSTS = 8          # distinct hosts kept warm in the pool
+POOL_PER_HOST = 4       # max concurrent connections per host
+RETRIES = 2
+RETRY_BACKOFF = 0.3
+RETRY_STATUS = (429, 502, 503, 504)
+
+try:
+    import brotli  # noqa: F401 - urllib3 only decodes "br" when it is installed
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The host failed repeatedly and is skipped for now (see health.py)"""
+
+
+_session = None
+_lock = threading.Lock()
+_stats = {"requests": 0, "time": 0.0}
+
+
+def get_session():
+    """Process-wide pooled session, created on first use"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                # Only refused/reset connections and RETRY_STATUS answers are retried:
+                # a read timeout is not, or one GET could block for RETRIES+1 timeouts
+                retry = Retry(
+                    total=RETRIES,
+                    connect=RETRIES,
+                    read=0,
+                    backoff_factor=RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUS,
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    raise_on_status=False,
+                )
+                # pool_block keeps us within POOL_PER_HOST sockets per host
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST,
+                                      max_retries=retry, pool_block=True)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Accept-Encoding": ACCEPT_ENCODING,
+                    "Connection": "keep-alive",
+                })
+                _session = session
+    return _session
+
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    GET through the shared session (same arguments as requests.get).
+    timeout is an upper bound: it shrinks with the recent latency of the host.
+    Raises CircuitOpenError right away while the host is considered down.
+    """
+    host = urlsplit(url).hostname
+    if not health.allow(host):
+        raise CircuitOpenError(f"Circuit open for {host}")
+    timeout = health.timeout_for(host, timeout)
+    start = time.perf_counter()
+    response = error = None
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _stats["requests"] += 1
+            _stats["time"] += elapsed
+        ok = error is None and response.status_code < 500
+        health.record(host, elapsed, ok=ok, failures=0 if ok else _failed_attempts(response, error))
+        conditional = bool(headers) and ("If-None-Match" in headers or "If-Modified-Since" in headers)
+        metrics.record_request(url, elapsed, response, error, conditional=conditional,
+                               streamed=kwargs.get("stream", False))
+
+
+def _failed_attempts(response, error):
+    """Failed tries behind one failed get(): the session retries are invisible to the caller"""
+    if response is not None:
+        retries = getattr(response.raw, "retries", None)
+        return len(retries.history) + 1 if retries else 1
+    # Read timeouts are not retried; connection errors are, until the retries run out
+    if isinstance(error, requests.exceptions.ConnectionError) and not isinstance(error, requests.exceptions.ReadTimeout):
+        return RETRIES + 1
+    return 1
+
+
+def get_stats():
+    """Requests made and seconds spent waiting on the network by this process"""
+    with _lock:
+        return dict(_stats)
+
+
+def conditional_get(url, validators, headers=None, **kwargs):
+    """
+    GET that sends the validators stored with a cached copy, so an unchanged
+    resource costs a 304 with no body. Check status_code == 304 on the result.
+    """
+    headers = dict(headers or {})
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return get(url, headers=headers, **kwargs)
+
+
+def validators_of(response):
+    """Validators to store with the body of response (empty if the server sent none)"""
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
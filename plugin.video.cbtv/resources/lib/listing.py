@@ -0,0 +1,60 @@
+from urllib.parse import urlencode
+
+import xbmcgui
+import xbmcplugin
+
+
+class Listing:
+    """
+    Collects the items of a directory and hands them to Kodi in a single
+    addDirectoryItems call when the listing is closed, instead of one Kodi
+    API crossing per entry.
+    """
+
+    def __init__(self, handle, base_url, fanart, on_emit=None):
+        self.handle = handle
+        self.base_url = base_url
+        self.items = []
+        self.on_emit = on_emit
+        # Shared art dict: setArt copies it, so it can be reused for every item
+        self._art = {'fanart': fanart}
+
+    def build_url(self, query):
+        return f"{self.base_url}?{urlencode(query)}"
+
+    def add(self, title, query, is_folder=True, icon=None, is_playable=False):
+        # offscreen: the item is not bound to the GUI yet, no locking while we build it
+        list_item = xbmcgui.ListItem(label=title, offscreen=True)
+
+        if icon:
+            # The local copy when the service has cached it, the URL otherwise
+            # (imported here: menus without artwork never load the cache modules)
+            from resources.lib import artwork
+            icon = artwork.local(icon)
+            self._art['icon'] = icon
+            self._art['thumb'] = icon
+        else:
+            self._art.pop('icon', None)
+            self._art.pop('thumb', None)
+        list_item.setArt(self._art)
+
+        if is_playable:
+            list_item.setProperty('IsPlayable', 'true')
+        self.items.append((self.build_url(query), list_item, is_folder))
+
+    def end(self, succeeded=True, sort_methods=None, cache_to_disc=True, update_listing=False):
+        """
+        Submit the collected items and close the directory.
+        sort_methods: xbmcplugin.SORT_METHOD_* offered to the user (first is the default)
+        cache_to_disc: let Kodi reuse the rendered listing when navigating back
+        (never for an empty listing: after an outage it must be rebuilt, not reused)
+        """
+        items, self.items = self.items, []
+        if items:
+            xbmcplugin.addDirectoryItems(self.handle, items, len(items))
+            if self.on_emit:
+                self.on_emit(len(items))
+        for method in sort_methods or (xbmcplugin.SORT_METHOD_UNSORTED,):
+            xbmcplugin.addSortMethod(self.handle, method)
+        xbmcplugin.endOfDirectory(self.handle, succeeded=succeeded,
+                                  updateListing=update_listing, cacheToDisc=cache_to_disc and bool(items))
@@ -0,0 +1,120 @@
+import datetime
+import re
+
+import xbmc
+from resources.lib.cache import DiskCache
+
+# Channel fields kept in the precomputed matches (all a listing needs to play them)
+CHANNEL_FIELDS = ("name", "code", "url", "image")
+
+
+def match_event_channels(ev, index, rules):
+    """
+    CDNLive channels for an agenda event, in display priority order:
+    channels named in the event or matching team names first, then the
+    likely broadcasters of its sport.
+    """
+    from resources.lib.scraper import map_channels
+    sport_kw = ev['sport'].lower()
+    search_text = ev['title'].lower()
+
+    # Extract team/athlete keywords
+    keywords = re.split(r'[-–—:,\s]+', search_text)
+    keywords = [kw for kw in keywords if len(kw) > 3]
+    keyword_ids = index.find_any(keywords)
+
+    # 1. High Priority: Channels explicitly mentioned OR matching team names
+    priority_matches = map_channels(ev['channels_raw'], index.channels, index)
+    priority_matches.extend(index.get(keyword_ids))
+
+    # 2. Medium Priority: Jolly matches based on sport context
+    jolly_matches = []
+
+    # Define what to include and what to EXCLUDE based on sport (rules.json, "broadcasters")
+    # e.g. for soccer we want "Sky Sport Football", "Sky Sport Calcio", or just "Sky Sport 1"
+    broadcaster_sport = rules.detect("broadcasters", sport_kw)
+    include_kws = rules.keywords(f"broadcasters.channels.{broadcaster_sport}.include")
+    exclude_kws = rules.keywords(f"broadcasters.channels.{broadcaster_sport}.exclude")
+
+    # Potential broadcasters, minus the STRICT EXCLUSION (soccer match on a "Tennis" channel...)
+    broadcaster_ids = index.find_any(include_kws) - index.find_any(exclude_kws)
+    for i in sorted(broadcaster_ids):
+        ch = index.channels[i]
+
+        # ANTI-SPAM: Limit numbered channels (Sky Sport 3, 4... beIN 5, 6...)
+        # unless it's a priority match already. Only keep main channels (1, 2)
+        # or unnumbered ones: sub_channel is flagged by catalog.normalize_channel
+        is_generic = i not in keyword_ids
+        if is_generic and ch["sub_channel"]:
+            continue
+
+        jolly_matches.append(ch)
+
+    # Combine and Deduplicate
+    seen_urls = set()
+    seen_names = set()
+    unique_matches = []
+
+    for m in priority_matches + jolly_matches:
+        m_url = m.get('url')
+        m_id = m["key"]
+        if m_url not in seen_urls and m_id not in seen_names:
+            unique_matches.append(m)
+            seen_urls.add(m_url)
+            seen_names.add(m_id)
+    return unique_matches
+
+
+def group_by_country(channels):
+    """[[country, [channel, ...]], ...] with Italy first, then alphabetical"""
+    by_country = {}
+    for ch in channels:
+        country = ch.get('code', '??').upper()
+        by_country.setdefault(country, []).append({k: ch.get(k) for k in CHANNEL_FIELDS})
+    return [[c, by_country[c]] for c in sorted(by_country, key=lambda x: (x != 'IT', x))]
+
+
+class EventMatches:
+    """
+    Channel matches of today's agenda events, computed in one batch when the
+    agenda is listed and stored by event id. The batch is tied to the channel
+    snapshot version it was computed from and is ignored once that changes.
+    """
+
+    def __init__(self):
+        self.cache = DiskCache("matches")
+        self.key = f"agenda_{datetime.date.today().isoformat()}"
+
+    def _load(self, version):
+        entry = self.cache.read(self.key)
+        if entry and entry["data"].get("channels_version") == version:
+            return entry["data"]["events"]
+        return {}
+
+    def prune(self):
+        """Delete the matches of past days' agendas"""
+        return self.cache.prune([self.key])
+
+    def get(self, event_id, version):
+        """Grouped channels for event_id, or None if not precomputed for this snapshot"""
+        if not event_id or not version:
+            return None
+        return self._load(version).get(event_id)
+
+    def precompute(self, events, resolver, rules):
+        """events: {event_id: event}. Only events missing for this snapshot are matched."""
+        channels = resolver.get_channels()
+        version = resolver.get_snapshot_version("channels")
+        if not channels or not version:
+            return
+        stored = self._load(version)
+        missing = {eid: ev for eid, ev in events.items() if eid not in stored}
+        if not missing:
+            return
+        index = resolver.get_channel_index(channels)
+        for eid, ev in missing.items():
+            stored[eid] = group_by_country(match_event_channels(ev, index, rules))
+        # Only today's listed events are kept
+        stored = {eid: stored[eid] for eid in events if eid in stored}
+        self.cache.write(self.key, {"channels_version": version, "events": stored})
+        xbmc.log(f"CDNLive: Precomputed channel matches for {len(missing)} events", xbmc.LOGINFO)
@@ -0,0 +1,117 @@
+import json
+import math
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import xbmc
+
+# Rolling per-request HTTP metrics kept in the addon profile, shown by debug_api
+METRICS_FILE = "http.jsonl"
+METRICS_KEEP = 3000
+METRICS_TRIM_BYTES = 512 * 1024
+WINDOW_HOURS = 24
+
+_lock = threading.Lock()
+
+
+def _append(record):
+    from resources.lib.cache import append_jsonl
+    with _lock:
+        try:
+            append_jsonl(METRICS_FILE, record, METRICS_KEEP, METRICS_TRIM_BYTES)
+        except OSError as e:
+            xbmc.log(f"CB TV Metrics: Write error: {str(e)}", xbmc.LOGWARNING)
+
+
+def _size(response, streamed):
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    # A streamed body is not read yet: its size is unknown here
+    return None if streamed else len(response.content)
+
+
+def record_request(url, elapsed, response=None, error=None, conditional=False, streamed=False):
+    """
+    One outbound request. elapsed is the time to the response headers (the
+    body of a streamed response is read later by the caller).
+    """
+    parts = urlsplit(url)
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    _append({
+        "ts": int(time.time()),
+        "kind": "http",
+        "host": parts.hostname,
+        "path": parts.path,
+        "ms": int(elapsed * 1000),
+        "status": response.status_code if response is not None else None,
+        "bytes": _size(response, streamed) if response is not None else None,
+        "retries": len(retries.history) if retries is not None else None,
+        "conditional": conditional,
+        "error": type(error).__name__ if error is not None else None,
+    })
+
+
+def record_cache(key, outcome):
+    """A DiskCache lookup: "hit", "stale", "miss" or "fallback" (upstream failed, old copy served)"""
+    _append({"ts": int(time.time()), "kind": "cache", "key": key, "outcome": outcome})
+
+
+def load(hours=WINDOW_HOURS):
+    """Records of the last hours, oldest first"""
+    from resources.lib.cache import profile_dir
+    since = time.time() - hours * 3600
+    records = []
+    try:
+        with open(os.path.join(profile_dir("stats"), METRICS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if rec.get("ts", 0) >= since:
+                    records.append(rec)
+    except OSError:
+        pass
+    return records
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values (None if empty)"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(records):
+    """
+    {"hosts": {host: {requests, errors, error_rate, p50, p95, not_modified, retries, bytes}},
+     "cache": {key: {outcome: count}}}
+    Errors are network failures and HTTP statuses >= 400.
+    """
+    by_host, cache = {}, {}
+    for rec in records:
+        if rec.get("kind") == "cache":
+            outcomes = cache.setdefault(rec.get("key"), {})
+            outcomes[rec.get("outcome")] = outcomes.get(rec.get("outcome"), 0) + 1
+        elif rec.get("kind") == "http":
+            by_host.setdefault(rec.get("host") or "?", []).append(rec)
+
+    hosts = {}
+    for host, recs in by_host.items():
+        latencies = [r["ms"] for r in recs if r.get("ms") is not None]
+        errors = sum(1 for r in recs if r.get("error") or (r.get("status") or 0) >= 400)
+        hosts[host] = {
+            "requests": len(recs),
+            "errors": errors,
+            "error_rate": errors / len(recs),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "not_modified": sum(1 for r in recs if r.get("status") == 304),
+            "retries": sum(r.get("retries") or 0 for r in recs),
+            "bytes": sum(r.get("bytes") or 0 for r in recs),
+        }
+    return {"hosts": hosts, "cache": cache}
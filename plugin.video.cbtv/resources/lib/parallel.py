@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import xbmc
+
+MAX_WORKERS = 6
+
+
+def fetch_all(tasks):
+    """
+    Run every data source an action needs at the same time.
+    tasks is {name: callable}; returns {name: result}, with None for a source
+    that raised, so the slowest source (not the sum of all) sets the wait.
+    """
+    if not tasks:
+        return {}
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(tasks))) as pool:
+        futures = {name: pool.submit(fn) for name, fn in tasks.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                xbmc.log(f"CDNLive: Source '{name}' failed: {str(e)}", xbmc.LOGWARNING)
+                results[name] = None
+    return results
@@ -0,0 +1,123 @@
+import sys
+import time
+
+import xbmc
+
+# Cold start budget per action (interpreter ready -> first list item), in ms
+COLD_START_TARGET_MS = 250
+
+# Rolling per-action stats kept in the addon profile
+STATS_FILE = "actions.jsonl"
+STATS_KEEP = 500
+STATS_TRIM_BYTES = 256 * 1024
+
+
+def _to_bool(value):
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+CONVERTERS = {bool: _to_bool}
+
+
+class Router:
+    """
+    Table of plugin actions. Handlers are registered with their typed
+    parameters; every dispatch is timed (wall, network, first item) and the
+    outcome is written to the Kodi log and to a rolling stats file.
+    """
+
+    def __init__(self, default, t0=None):
+        self.default = default
+        self.routes = {}
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.items = 0
+        self.first_item = None
+
+    def route(self, action, **params):
+        """
+        Register the decorated function for action. params maps each query
+        parameter to its type, or to a (type, default) tuple.
+        """
+        def decorator(fn):
+            self.routes[action] = (fn, params)
+            return fn
+        return decorator
+
+    def item_emitted(self, count=1):
+        if self.first_item is None:
+            self.first_item = time.perf_counter()
+        self.items += count
+
+    @staticmethod
+    def _parse(params, spec):
+        kwargs = {}
+        for name, typ in spec.items():
+            default = None
+            if isinstance(typ, tuple):
+                typ, default = typ
+            raw = params.get(name)
+            if raw is None or raw == "":
+                kwargs[name] = default
+                continue
+            try:
+                kwargs[name] = CONVERTERS.get(typ, typ)(raw)
+            except (TypeError, ValueError):
+                xbmc.log(f"CB TV Router: Bad value for {name}: {raw!r}", xbmc.LOGWARNING)
+                kwargs[name] = default
+        return kwargs
+
+    @staticmethod
+    def _net_stats():
+        # Only look at the HTTP layer if the action actually imported it
+        # (a background refresh may still be importing it: get_stats not defined yet)
+        get_stats = getattr(sys.modules.get("resources.lib.httpclient"), "get_stats", None)
+        return get_stats() if get_stats else {"requests": 0, "time": 0.0}
+
+    def dispatch(self, params):
+        action = params.get("action") or self.default
+        if action not in self.routes:
+            xbmc.log(f"CB TV Router: Unknown action {action!r}", xbmc.LOGWARNING)
+            return None
+
+        fn, spec = self.routes[action]
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return fn(**self._parse(params, spec))
+        except Exception as e:
+            outcome = f"error: {type(e).__name__}"
+            raise
+        finally:
+            self._record(action, start, outcome)
+
+    def _record(self, action, start, outcome):
+        now = time.perf_counter()
+        ms = lambda t: int((t - self.t0) * 1000) if t else None
+        net = self._net_stats()
+        record = {
+            "ts": int(time.time()),
+            "action": action,
+            "outcome": outcome,
+            "wall_ms": int((now - start) * 1000),
+            "net_ms": int(net["time"] * 1000),
+            "requests": net["requests"],
+            "items": self.items,
+            "import_ms": ms(start),
+            "first_item_ms": ms(self.first_item),
+        }
+        first_item = record["first_item_ms"]
+        slow = first_item is not None and first_item > COLD_START_TARGET_MS
+        xbmc.log(
+            f"CB TV Action: {action} {outcome} wall={record['wall_ms']}ms net={record['net_ms']}ms "
+            f"({record['requests']} req) items={record['items']} import={record['import_ms']}ms "
+            f"first_item={'-' if first_item is None else first_item}ms (target {COLD_START_TARGET_MS}ms)",
+            xbmc.LOGWARNING if slow or outcome != "ok" else xbmc.LOGINFO)
+        self._save(record)
+
+    @staticmethod
+    def _save(record):
+        from resources.lib.cache import append_jsonl
+        try:
+            append_jsonl(STATS_FILE, record, STATS_KEEP, STATS_TRIM_BYTES)
+        except OSError as e:
+            xbmc.log(f"CB TV Router: Stats write error: {str(e)}", xbmc.LOGWARNING)
@@ -0,0 +1,149 @@
+import json
+import os
+
+import xbmc
+
+# Default rule table shipped with the addon. Users can extend it without code
+# changes with a rules.json in the addon profile: lists are appended to the
+# default ones and new keys are added (e.g. a new sport under "detect").
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "rules.json")
+USER_RULES = "rules.json"
+
+
+class Matcher:
+    """
+    Aho-Corasick automaton over every keyword of the rule table. One pass
+    over a string returns all the categories whose keywords occur in it.
+    """
+
+    def __init__(self, patterns):
+        # patterns: {keyword: set of categories}
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for kw, cats in patterns.items():
+            state = 0
+            for ch in kw:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                state = nxt
+            self.out[state] |= set(cats)
+
+        # Breadth first: a state's failure link always points to a shallower state
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if self.goto[f].get(ch) != nxt else 0
+                self.out[nxt] |= self.out[self.fail[nxt]]
+        self.out = [frozenset(o) for o in self.out]
+        self._memo = {}
+
+    def match(self, text):
+        text = text.lower()
+        found = self._memo.get(text)
+        if found is not None:
+            return found
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        found = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        found = frozenset(found)
+        self._memo[text] = found
+        return found
+
+
+def _merge(base, extra):
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        elif isinstance(value, list) and isinstance(base.get(key), list):
+            base[key].extend(v for v in value if v not in base[key])
+        else:
+            base[key] = value
+    return base
+
+
+def _flatten(table, path="", patterns=None):
+    """{keyword: {category}} where the category is the dotted path of the keyword list"""
+    if patterns is None:
+        patterns = {}
+    for key, value in table.items():
+        cat = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            _flatten(value, cat, patterns)
+        elif isinstance(value, list):
+            for kw in value:
+                patterns.setdefault(kw.lower(), set()).add(cat)
+    return patterns
+
+
+class Rules:
+    def __init__(self, table):
+        self.table = table
+        self.matcher = Matcher(_flatten(table))
+
+    def match(self, text):
+        """All categories (e.g. "agenda.excluded") with a keyword contained in text"""
+        return self.matcher.match(text or "")
+
+    def keywords(self, path):
+        """Keyword list at a dotted path, for callers that query an index with it"""
+        node = self.table
+        for part in path.split("."):
+            node = node.get(part, {}) if isinstance(node, dict) else {}
+        return [kw.lower() for kw in node] if isinstance(node, list) else []
+
+    def detect(self, section, text):
+        """First entry of section.detect matched by text, in table order, else "default" """
+        cats = self.match(text)
+        for name in self.table.get(section, {}).get("detect", {}):
+            if f"{section}.detect.{name}" in cats:
+                return name
+        return "default"
+
+
+_rules = None
+
+
+def get_rules():
+    """Rule table compiled once per process (defaults + user extensions)"""
+    global _rules
+    if _rules is None:
+        with open(DEFAULT_RULES, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        from resources.lib.cache import profile_dir
+        user_path = os.path.join(profile_dir(), USER_RULES)
+        if os.path.exists(user_path):
+            try:
+                with open(user_path, "r", encoding="utf-8") as f:
+                    _merge(table, json.load(f))
+            except (OSError, ValueError) as e:
+                xbmc.log(f"CB TV Rules: Ignoring invalid {user_path}: {str(e)}", xbmc.LOGERROR)
+        _rules = Rules(table)
+    return _rules
+
+
+def signature():
+    """Fingerprint of the rule files (mtimes only), for data derived from the rules"""
+    from resources.lib.cache import profile_dir
+    sig = []
+    for path in (DEFAULT_RULES, os.path.join(profile_dir(), USER_RULES)):
+        try:
+            sig.append(int(os.path.getmtime(path)))
+        except OSError:
+            sig.append(0)
+    return tuple(sig)
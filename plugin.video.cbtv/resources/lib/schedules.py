@@ -1,35 +1,174 @@
+import bisect
 import datetime
+import glob
+import json
+import os
 
-class SportsSchedules:
-    @staticmethod
-    def get_motors_gp():
-        # Hardcoded 2024/2025 GP examples - can be expanded
-        today = datetime.date.today()
-        gps = [
-            {"name": "GP Bahrain", "date": datetime.date(2025, 3, 2), "sport": "F1"},
-            {"name": "GP Saudi Arabia", "date": datetime.date(2025, 3, 9), "sport": "F1"},
-            {"name": "GP Australia", "date": datetime.date(2025, 3, 23), "sport": "F1"},
-            {"name": "GP Qatar", "date": datetime.date(2025, 3, 2), "sport": "MotoGP"},
-            {"name": "GP Portugal", "date": datetime.date(2025, 3, 23), "sport": "MotoGP"},
-            {"name": "Australian Open", "date": today, "sport": "Tennis"},
-        ]
-        return [gp for gp in gps if gp["date"] >= today]
-
-    @staticmethod
-    def get_channel_mapping(sport):
-        mapping = {
-            "F1": ["Sky Sport F1"],
-            "MotoGP": ["Sky Sport MotoGP"],
-            "Tennis": ["Sky Sport Tennis", "SuperTennis", "Eurosport 1", "Eurosport 2"],
-            "Volleyball": ["Sky Sport Arena", "Rai Sport"]
-        }
-        return mapping.get(sport, [])
-
-    @staticmethod
-    def get_sport_icons():
-        return {
-            "F1": "https://img.icons8.com/color/48/f1.png",
-            "MotoGP": "https://img.icons8.com/color/48/motorcycle.png",
-            "Tennis": "https://img.icons8.com/color/48/tennis.png",
-            "Volleyball": "https://img.icons8.com/color/48/volleyball.png"
-        }
+import xbmc
+
+# Default calendar shipped with the addon: per-sport icon and broadcasters, and
+# the events. More calendars can be dropped in the profile "schedules" folder,
+# as JSON files with the same layout or as .ics exports (CATEGORIES = sport).
+DEFAULT_SCHEDULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "schedules.json")
+USER_SCHEDULES = "schedules"
+
+DAY = 86400
+# Length of a timed event without an end, unless its sport sets "duration" (minutes)
+DEFAULT_DURATION = 2 * 3600
+
+
+def _is_date(value):
+    value = value.strip()
+    return len(value) in (8, 10) and "T" not in value
+
+
+def _parse_time(value, end=False):
+    """
+    Timestamp of an ISO date/datetime ("2025-03-02", "2025-03-02T15:00:00Z")
+    or an iCalendar one ("20250302", "20250302T150000Z"). A bare date is the
+    whole local day: its start, or with end=True the start of the next day.
+    """
+    value = value.strip()
+    if _is_date(value):
+        fmt = "%Y%m%d" if len(value) == 8 else "%Y-%m-%d"
+        day = datetime.datetime.strptime(value, fmt)
+        return day.timestamp() + (DAY if end else 0)
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    if "-" not in value[:8]:
+        # iCalendar basic format
+        dt = datetime.datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+        if value[15:]:
+            dt = dt.replace(tzinfo=datetime.timezone.utc)
+        return dt.timestamp()
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _read_ics(path):
+    """VEVENTs of an .ics file as {"name", "sport", "start", "end"} (only the fields we use)"""
+    events, ev, last = [], None, None
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().replace("\r\n", "\n").split("\n")
+    for line in lines:
+        if line[:1] in (" ", "\t") and ev is not None and last:
+            # Folded line: continuation of the previous property
+            ev[last] += line[1:]
+            continue
+        name, _, value = line.partition(":")
+        prop = name.split(";")[0].upper()
+        if prop == "BEGIN" and value == "VEVENT":
+            ev = {}
+        elif prop == "END" and value == "VEVENT" and ev is not None:
+            if ev.get("start") and ev.get("name"):
+                events.append(ev)
+            ev = None
+        elif ev is not None:
+            last = {"SUMMARY": "name", "CATEGORIES": "sport", "DTSTART": "start", "DTEND": "end"}.get(prop)
+            if last:
+                ev[last] = value
+    for ev in events:
+        ev["sport"] = ev.get("sport", "").split(",")[0].strip()
+        # DTEND of an all-day event is already exclusive: keep it as a timestamp
+        if ev.get("end"):
+            ev["end"] = _parse_time(ev["end"])
+    return events
+
+
+class ScheduleStore:
+    """
+    Calendar events sorted by start time. `upcoming` and `live` are bisect
+    lookups; `live` only has to check the events that started at most the
+    longest event duration ago.
+    """
+
+    def __init__(self, sports, events):
+        self.sports = sports
+        items = []
+        for ev in events:
+            try:
+                start = _parse_time(ev["start"])
+                end = ev.get("end")
+                if end is None and not _is_date(ev["start"]):
+                    # Timed event: it lasts the usual length of its sport
+                    minutes = sports.get(ev.get("sport"), {}).get("duration")
+                    end = start + (minutes * 60 if minutes else DEFAULT_DURATION)
+                elif end is None:
+                    end = _parse_time(ev["start"], end=True)
+                elif isinstance(end, str):
+                    end = _parse_time(end, end=True)
+            except (KeyError, ValueError) as e:
+                xbmc.log(f"CB TV Schedules: Skipping event {ev.get('name')}: {str(e)}", xbmc.LOGWARNING)
+                continue
+            items.append(dict(ev, start=start, end=max(end, start)))
+        items.sort(key=lambda e: e["start"])
+        self.events = items
+        self.starts = [e["start"] for e in items]
+        self.max_duration = max((e["end"] - e["start"] for e in items), default=0)
+        self._channels = None
+
+    def upcoming(self, days=7, now=None, sport=None):
+        """Events starting between now and now + days, by start time"""
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        lo = bisect.bisect_left(self.starts, now)
+        hi = bisect.bisect_right(self.starts, now + days * DAY)
+        return [e for e in self.events[lo:hi] if sport is None or e.get("sport") == sport]
+
+    def live(self, now=None, sport=None):
+        """Events in progress at now"""
+        now = now if now is not None else datetime.datetime.now().timestamp()
+        lo = bisect.bisect_left(self.starts, now - self.max_duration)
+        hi = bisect.bisect_right(self.starts, now)
+        return [e for e in self.events[lo:hi]
+                if e["end"] > now and (sport is None or e.get("sport") == sport)]
+
+    def icon(self, sport):
+        return self.sports.get(sport, {}).get("icon")
+
+    def channels(self, sport, index):
+        """
+        Catalog channels broadcasting sport. The whole sport -> channels map is
+        resolved against the channel index on first use, then reused.
+        """
+        if self._channels is None or self._channels[0] is not index:
+            mapping = {
+                name: index.get(index.find_any(conf.get("channels", [])))
+                for name, conf in self.sports.items()
+            }
+            self._channels = (index, mapping)
+        return self._channels[1].get(sport, [])
+
+
+def _merge(sports, events, table):
+    for name, conf in table.get("sports", {}).items():
+        base = sports.setdefault(name, {})
+        base["channels"] = base.get("channels", []) + [c for c in conf.get("channels", [])
+                                                       if c not in base.get("channels", [])]
+        for field in ("icon", "duration"):
+            if conf.get(field):
+                base[field] = conf[field]
+    events.extend(table.get("events", []))
+
+
+_store = None
+
+
+def get_schedules():
+    """Schedule store loaded once per process (default calendar + user calendars)"""
+    global _store
+    if _store is None:
+        sports, events = {}, []
+        with open(DEFAULT_SCHEDULES, "r", encoding="utf-8") as f:
+            _merge(sports, events, json.load(f))
+        from resources.lib.cache import profile_dir
+        user_dir = profile_dir(USER_SCHEDULES)
+        for path in sorted(glob.glob(os.path.join(user_dir, "*.json")) + glob.glob(os.path.join(user_dir, "*.ics"))):
+            try:
+                if path.endswith(".ics"):
+                    events.extend(_read_ics(path))
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        _merge(sports, events, json.load(f))
+            except (OSError, ValueError) as e:
+                xbmc.log(f"CB TV Schedules: Ignoring invalid {path}: {str(e)}", xbmc.LOGERROR)
+        _store = ScheduleStore(sports, events)
+    return _store
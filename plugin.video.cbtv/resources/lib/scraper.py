@@ -1,20 +1,103 @@
-import requests
 import re
+from resources.lib import httpclient
 from urllib.parse import unquote
 
-def get_oasport_events():
-    url = "https://www.oasport.it/tag/sport-in-tv-oggi/feed/"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+# Parsed agenda cache policy in seconds: (fresh for, then served stale while refreshing for)
+AGENDA_TTL = (900, 3 * 3600)
+
+def _agenda_cache_key():
+    # One snapshot per day: yesterday's agenda is never served as today's
+    import datetime
+    return f"oasport_{datetime.date.today().isoformat()}"
+
+def _load_agenda(validators):
+    """
+    Cache loader: conditional fetch of the feed. An unchanged feed (304) means
+    an unchanged parsed agenda, so nothing is downloaded or parsed again.
+    An empty result is treated as a failure so that it is retried next time.
+    """
+    from resources.lib.cache import NOT_MODIFIED, Validated
     try:
-        r = requests.get(url, headers=headers, timeout=15)
-        content = r.text
-        
-        # Use findall to get all items (usually first 5 is enough)
-        items = re.findall(r'<item>(.*?)</item>', content, re.DOTALL)
-        if not items: return []
-        
+        r = httpclient.conditional_get(FEED_URL, validators, headers=FEED_HEADERS, stream=True)
+    except Exception as e:
+        import xbmc
+        xbmc.log(f"CDNLive Scraper: Feed request failed: {str(e)}", xbmc.LOGERROR)
+        return None
+    if r.status_code == 304:
+        r.close()
+        return NOT_MODIFIED
+    events = get_oasport_events(r)
+    return Validated(events, httpclient.validators_of(r)) if events else None
+
+def get_agenda():
+    """Today's parsed agenda, served from the on-disk cache when possible"""
+    from resources.lib.cache import DiskCache
+    ttl, stale_ttl = AGENDA_TTL
+    events = DiskCache("agenda").fetch(_agenda_cache_key(), _load_agenda, ttl, stale_ttl)
+    return events or []
+
+def warm_agenda(margin=0):
+    """Refresh the cached agenda ahead of expiry (background service)"""
+    from resources.lib.cache import DiskCache
+    return DiskCache("agenda").warm(_agenda_cache_key(), _load_agenda, AGENDA_TTL[0], margin)
+
+def prune_agenda():
+    """Delete the cached agendas of past days"""
+    from resources.lib.cache import DiskCache
+    return DiskCache("agenda").prune([_agenda_cache_key()])
+
+FEED_URL = "https://www.oasport.it/tag/sport-in-tv-oggi/feed/"
+FEED_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+FEED_MAX_ITEMS = 15
+FEED_CHUNK_SIZE = 8192
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+
+def iter_feed_items(r):
+    """
+    Parse a streamed RSS response (stream=True) and yield each <item> as soon
+    as it has been received, as a dict with title, pubDate and text
+    (content:encoded, else description). The socket is closed as soon as the
+    caller stops iterating.
+    """
+    from xml.etree.ElementTree import XMLPullParser, ParseError
+    try:
+        parser = XMLPullParser(events=("end",))
+        for chunk in r.iter_content(chunk_size=FEED_CHUNK_SIZE):
+            try:
+                parser.feed(chunk)
+                events = list(parser.read_events())
+            except ParseError as e:
+                import xbmc
+                xbmc.log(f"CDNLive Scraper: Feed parse error, stopping: {str(e)}", xbmc.LOGWARNING)
+                return
+            for _, elem in events:
+                if elem.tag != "item":
+                    continue
+                yield {
+                    "title": elem.findtext("title", ""),
+                    "pubDate": elem.findtext("pubDate", ""),
+                    "text": elem.findtext(CONTENT_ENCODED) or elem.findtext("description", ""),
+                }
+                # Already consumed: drop the subtree to keep peak memory flat
+                elem.clear()
+    finally:
+        r.close()
+
+def _parse_pub_date(pub_str):
+    from email.utils import parsedate_to_datetime
+    try:
+        return parsedate_to_datetime(pub_str).date()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def get_oasport_events(response=None):
+    """Today's events from the feed (or from an already opened streamed response)"""
+    try:
+        if response is None:
+            response = httpclient.get(FEED_URL, headers=FEED_HEADERS, stream=True)
         import datetime
         today = datetime.datetime.now()
+        yesterday = (today - datetime.timedelta(days=1)).date()
         months_it = ["gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre"]
         weekday_it = ["lunedì", "martedì", "mercoledì", "giovedì", "venerdì", "sabato", "domenica"]
         
@@ -29,16 +112,20 @@ def get_oasport_events():
         other_days = [d for d in weekday_it if d != current_wday_it]
         
         events = []
-        for item_content in items[:15]: # Check more items just in case
-            title_m = re.search(r'<title>(.*?)</title>', item_content)
-            item_title = title_m.group(1).lower() if title_m else ""
+        for n, item in enumerate(iter_feed_items(response)):
+            if n >= FEED_MAX_ITEMS: # Check more items just in case
+                break
+            item_title = item["title"].lower()
             
             # PubDate check: Skip if older than ~36 hours
-            pub_m = re.search(r'<pubDate>(.*?)</pubDate>', item_content)
-            if pub_m:
+            if item["pubDate"]:
+                # The feed is newest first: past yesterday nothing can be for today
+                pub_date = _parse_pub_date(item["pubDate"])
+                if pub_date and pub_date < yesterday:
+                    break
                 try:
                     # e.g. "Mon, 02 Feb 2026 06:21:56 +0000"
-                    pub_str = pub_m.group(1)
+                    pub_str = item["pubDate"]
                     # Simple check: month and day must be somewhat recent
                     # We can check if the month is correct and day is within [today-1, today]
                     parts = pub_str.split()
@@ -70,13 +157,7 @@ def get_oasport_events():
             if not is_recent_title and "calcio" not in item_title:
                 continue
             
-            text = ""
-            for tag in ["content:encoded", "description"]:
-                 m = re.search(f'<{tag}>(?:<!\\[CDATA\\[)?(.*?)(?:\\]\\]>)?</{tag}>', item_content, re.DOTALL)
-                 if m:
-                     text = m.group(1)
-                     break
-            
+            text = item["text"]
             if not text: continue
             
             # CRITICAL: Replace paragraph tags and breaks with real newlines BEFORE stripping
@@ -157,10 +238,15 @@ def get_oasport_events():
         xbmc.log(f"CDNLive Scraper Fatal Error: {str(e)}", xbmc.LOGERROR)
         return []
 
-def map_channels(raw_str, all_cdn_channels):
+def map_channels(raw_str, all_cdn_channels, index=None):
     """
     Search for mention of channels in the raw string and match them with CDN Live channels.
+    Pass the snapshot's ChannelIndex to avoid rebuilding it on every call.
     """
+    if index is None or index.channels is not all_cdn_channels:
+        from resources.lib.channel_index import ChannelIndex
+        index = ChannelIndex(all_cdn_channels)
+
     found = []
     # Key channel names to look for
     keywords = [
@@ -175,10 +261,8 @@ def map_channels(raw_str, all_cdn_channels):
     raw_lower = raw_str.lower()
     for kw in keywords:
         if kw.lower() in raw_lower:
-            # Try to find a match in all_cdn_channels
-            # We look for a suffix match or flexible match
-            matches = [ch for ch in all_cdn_channels if kw.lower() in ch.get("name", "").lower()]
-            found.extend(matches)
+            # Channels whose name contains the keyword, straight from the index
+            found.extend(index.get(index.find(kw)))
     
     # Deduplicate by URL
     seen = set()
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+import xbmc
+from resources.lib.cache import profile_dir
+
+ID_RE = re.compile(r'^[0-9a-f]{12}$')
+
+
+class ObjectStore:
+    """
+    Keyed store for the objects a listing hands to the next screen (events,
+    premium sections, matches), so plugin URLs carry a short id instead of a
+    URL-encoded JSON payload. One file per object: lookups cost the same no
+    matter how many objects are stored.
+    """
+
+    # Objects not listed again for this long are deleted
+    MAX_AGE = 3 * 24 * 3600
+    PRUNE_EVERY = 6 * 3600
+
+    def __init__(self, namespace):
+        self.path = profile_dir("store", namespace)
+
+    @staticmethod
+    def make_id(obj):
+        # Content addressed: the same object always gets the same (stable) URL
+        raw = json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()[:12]
+
+    def _file(self, obj_id):
+        return os.path.join(self.path, obj_id + ".json")
+
+    def put(self, obj):
+        obj_id = self.make_id(obj)
+        path = self._file(obj_id)
+        try:
+            if os.path.exists(path):
+                # Listed again: keep it alive
+                os.utime(path)
+            else:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(obj, f, separators=(",", ":"))
+                os.replace(tmp, path)
+        except OSError as e:
+            xbmc.log(f"CDNLive Store: Write error: {str(e)}", xbmc.LOGERROR)
+        return obj_id
+
+    def put_many(self, objs):
+        ids = [self.put(obj) for obj in objs]
+        self.prune()
+        return ids
+
+    def get(self, obj_id):
+        if not obj_id or not ID_RE.match(obj_id):
+            return None
+        try:
+            with open(self._file(obj_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prune(self):
+        """Drop expired objects, at most once every PRUNE_EVERY seconds"""
+        marker = os.path.join(self.path, ".pruned")
+        now = time.time()
+        try:
+            if now - os.path.getmtime(marker) < self.PRUNE_EVERY:
+                return
+        except OSError:
+            pass
+        try:
+            open(marker, "w").close()
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".json") and now - entry.stat().st_mtime > self.MAX_AGE:
+                    os.remove(entry.path)
+        except OSError as e:
+            xbmc.log(f"CDNLive Store: Prune error: {str(e)}", xbmc.LOGWARNING)
@@ -0,0 +1,84 @@
+import random
+
+import xbmc
+from resources.lib.agenda import refresh_widget_agenda, widget_agenda_outdated
+from resources.lib.artwork import ArtworkCache, wanted_urls
+from resources.lib.catalog_db import CatalogDB
+from resources.lib.cdnlive import CDNLiveResolver
+from resources.lib.matching import EventMatches
+from resources.lib.scraper import prune_agenda, warm_agenda
+
+# Background cache warmer: keeps the on-disk store fresh so menus never wait on the network
+STARTUP_DELAY = 20       # let Kodi finish booting first
+POLL_INTERVAL = 60       # base period between checks (seconds)
+POLL_JITTER = 15         # +/- random spread, avoids hitting the upstream in lockstep
+PLAYBACK_RECHECK = 120   # while something is playing we only check if it stopped
+
+WARM_ENDPOINTS = ["channels", "events/sports"]
+
+
+class CacheWarmer(xbmc.Monitor):
+    def __init__(self):
+        super().__init__()
+        self.player = xbmc.Player()
+        self.resolver = CDNLiveResolver()
+        self.artwork = ArtworkCache()
+        # Logos left to download: checked at startup and after every catalog refresh
+        self.art_pending = True
+
+    def next_wait(self):
+        return POLL_INTERVAL + random.uniform(-POLL_JITTER, POLL_JITTER)
+
+    def warm(self):
+        # Refresh everything that would go stale before the next round; the
+        # derived data is rebuilt only for sources whose content changed (a 304
+        # or an identical body leaves it as is)
+        margin = POLL_INTERVAL + POLL_JITTER
+        changed = set()
+        for endpoint in WARM_ENDPOINTS:
+            if self.abortRequested():
+                return
+            if self.resolver.warm_api(endpoint, margin):
+                xbmc.log(f"CDNLive Service: Refreshed {endpoint}", xbmc.LOGDEBUG)
+                changed.add(endpoint)
+        if changed and not self.abortRequested():
+            # Keep the search database in step, so the search action finds it loaded
+            db = CatalogDB()
+            try:
+                db.sync(self.resolver)
+            finally:
+                db.close()
+        if not self.abortRequested() and warm_agenda(margin):
+            xbmc.log("CDNLive Service: Refreshed agenda", xbmc.LOGDEBUG)
+            changed.add("agenda")
+        # Widgets read the filtered agenda from disk: rebuild it with its sources
+        if ({"events/sports", "agenda"} & changed or widget_agenda_outdated()) and not self.abortRequested():
+            refresh_widget_agenda(self.resolver)
+        if ("channels" in changed or self.art_pending) and not self.abortRequested():
+            left = self.artwork.prefetch(wanted_urls(self.resolver), abort=self.abortRequested)
+            self.art_pending = left > 0
+        # Daily snapshots of past days are never read again
+        prune_agenda()
+        EventMatches().prune()
+
+    def run(self):
+        xbmc.log("CDNLive Service: Started", xbmc.LOGINFO)
+        if self.waitForAbort(STARTUP_DELAY + random.uniform(0, POLL_JITTER)):
+            return
+        while not self.abortRequested():
+            if self.player.isPlaying():
+                # Never compete with the stream for bandwidth or CPU
+                wait = PLAYBACK_RECHECK
+            else:
+                try:
+                    self.warm()
+                except Exception as e:
+                    xbmc.log(f"CDNLive Service: Warm-up error: {str(e)}", xbmc.LOGERROR)
+                wait = self.next_wait()
+            if self.waitForAbort(wait):
+                break
+        xbmc.log("CDNLive Service: Stopped", xbmc.LOGINFO)
+
+
+if __name__ == '__main__':
+    CacheWarmer().run()